@@ -0,0 +1,22 @@
+'''Benchmark suite for the solvers.
+
+    corpora.py  ==> the puzzles, by level (easy to extreme 9x9 puzzles,
+                    and 16x16 and 25x25 grids)
+    runner.py   ==> solves them with every combination of model,
+                    propagator and variable/value ordering asked for,
+                    measuring wall and CPU time, decisions, prunings and
+                    peak memory, writes the measurements as JSON and
+                    compares them with a stored baseline
+
+Run from the top directory of the repository, e.g.
+
+    python -m benchmarks --levels easy medium --out results.json
+    python -m benchmarks --baseline results.json
+
+baseline.json holds the runs of the default options, the baseline a CI
+job compares with (see runner.py):
+
+    python -m benchmarks --baseline benchmarks/baseline.json --ignore-time
+
+See python -m benchmarks --help for all the options.
+'''
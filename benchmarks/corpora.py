@@ -0,0 +1,90 @@
+'''Puzzle corpora for the benchmarks.
+
+The 9x9 puzzles are well known puzzles, all with a unique solution,
+grouped by their usual rating. The 16x16 and 25x25 grids are built from
+a pattern solution shuffled with a fixed seed, with a fixed share of
+the cells blanked (so they need not have a unique solution); the same
+seed always gives the same grid.
+
+A corpus entry is a tuple (name, level, grid), grid being a list of N
+lists of N ints with 0 for a blank, as taken by models.sudoku.
+'''
+
+import random
+
+LEVELS = ["easy", "medium", "hard", "extreme", "large"]
+
+PUZZLES = {
+    "easy": [
+        ("easy-1", "..3.2.6..9..3.5..1..18.64....81.29..7.......8..67.82....26.95..8..2.3..9..5.1.3.."),
+        ("easy-2", "...26.7.168..7..9.19...45..82.1...4...46.29...5...3.28..93...74.4..5..367.3.18..."),
+    ],
+    "medium": [
+        ("medium-1", "...2...633....54.1..1..398........9....538....3........263..5..5.37....847...1..."),
+        ("medium-2", "..53.....8......2..7..1.5..4....53...1..7...6..32...8..6.5....9..4....3......97.."),
+    ],
+    "hard": [
+        ("hard-1", "8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4.."),
+        ("hard-2", "1....7.9..3..2...8..96..5....53..9...1..8...26....4...3......1..4......7..7...3.."),
+        ("hard-3", "1.....7.9.4...72..8.........7..1..6.3.......5.6..4..2.........8..53...7.7.2....46"),
+    ],
+    "extreme": [
+        ("extreme-1", "4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......"),
+        ("extreme-2", "52...6.........7.13...........4..8..6......5...........418.........3..2...87....."),
+        ("extreme-3", "6.....8.3.4.7.................5.4.7.3..2.....1.6.......2.....5.....8.6......1...."),
+        ("extreme-4", "000000010400000000020000000000050407008000300001090000300400200050100000000806000"),
+    ],
+}
+
+#(name, box side, seed, share of the cells left as clues)
+LARGE = [
+    ("large-16-1", 4, 1, 0.55),
+    ("large-16-2", 4, 2, 0.50),
+    ("large-25-1", 5, 1, 0.55),
+]
+
+def parse(puzzle, N=9):
+    '''return the grid of a puzzle string (one character per cell, row
+       by row, '.' or '0' for a blank)'''
+    return [[0 if ch in '.0' else int(ch) for ch in puzzle[r * N:(r + 1) * N]]
+            for r in range(N)]
+
+def pattern_grid(B, seed, clue_share):
+    '''Return an N x N grid (N = B*B): the pattern solution
+       (B*(r%B) + r//B + c) % N + 1 with its rows (within bands), bands,
+       columns (within stacks), stacks and digits shuffled, and then all
+       but clue_share of its cells blanked, everything drawn from
+       random.Random(seed)'''
+    N = B * B
+    rng = random.Random(seed)
+    def lines():
+        bands = rng.sample(range(B), B)
+        return [b * B + i for b in bands for i in rng.sample(range(B), B)]
+    rows = lines()
+    cols = lines()
+    digits = rng.sample(range(1, N + 1), N)
+    grid = []
+    for r in rows:
+        grid.append([digits[(B * (r % B) + r // B + c) % N] for c in cols])
+    for r in range(N):
+        for c in range(N):
+            if rng.random() >= clue_share:
+                grid[r][c] = 0
+    return grid
+
+def corpus(levels=None):
+    '''return the list of (name, level, grid) of the given levels (all
+       of them by default)'''
+    if levels is None:
+        levels = LEVELS
+    entries = []
+    for level in levels:
+        if level == "large":
+            for name, B, seed, share in LARGE:
+                entries.append((name, level, pattern_grid(B, seed, share)))
+        elif level in PUZZLES:
+            for name, puzzle in PUZZLES[level]:
+                entries.append((name, level, parse(puzzle)))
+        else:
+            raise ValueError("unknown level {!r}".format(level))
+    return entries
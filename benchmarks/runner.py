@@ -0,0 +1,180 @@
+'''Benchmark runner: solve the corpora with every combination of model,
+propagator, variable ordering and value ordering asked for.
+
+For every run the model is built afresh and searched with
+BT.bt_search(..., iterative=True); the run records the status, the
+decisions and prunings, the wall and CPU time of the search and the
+peak memory (measured with tracemalloc, model building included). As
+tracemalloc slows Python down, memory is measured in a second run of
+the same search, so it does not distort the times. A search taking more
+than the time limit is stopped through BT.stop and has status
+"stopped"; its memory is not measured.
+
+prop_FC is not in the default set of propagators: on the default
+sudoku_nary_ad model it only prunes once an all-different constraint
+has a single unassigned variable left, and hits the time limit on every
+corpus puzzle. Ask for it with --propagators (best with --models
+sudoku).
+
+The runs are written as JSON, {"meta": {...}, "runs": [...]}, and can
+be compared with such a file from an earlier run (the baseline). A run
+regresses if it is now stopped but was not, or if its decisions, CPU
+time or peak memory grew by more than the tolerance. main() returns 1
+when there are regressions, so the suite can gate a CI job.
+
+benchmarks/baseline.json is the baseline kept in the repository: the
+runs of the default options (python -m benchmarks --out
+benchmarks/baseline.json), to be rewritten whenever a change is meant
+to alter them. Its CPU times are those of the machine it was made on,
+so a CI job on other machines compares with it using --ignore-time:
+
+    python -m benchmarks --baseline benchmarks/baseline.json --ignore-time
+
+Statuses, decisions and (for the same Python version) peak memory do
+not depend on the machine.
+'''
+
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+
+import models
+import propagators
+import heuristics
+from cspbase import BT, SearchResult
+from benchmarks.corpora import LEVELS, corpus
+
+MODELS = ["sudoku", "sudoku_nary_ad"]
+PROPAGATORS = ["prop_BT", "prop_FC", "prop_GAC", "prop_GAC_residual"]
+VAR_ORDS = ["none", "ord_mrv", "ord_mrv_deg", "ord_dom_deg", "ord_dom_wdeg"]
+VAL_ORDS = ["none", "val_lcv", "val_min_conflicts"]
+
+MIN_TIME = 0.01     #CPU time differences below this are noise
+
+def lookup(module, name):
+    '''the function called name in module ("none" for None)'''
+    if name == "none":
+        return None
+    return getattr(module, name)
+
+def search(grid, model, propagator, var_ord, val_ord, time_limit):
+    '''Build the model of grid and search it, giving up after
+       time_limit CPU seconds (None for no limit). Return the
+       SearchResult.'''
+    csp, var_array = model(grid)
+    solver = BT(csp)
+    if time_limit is not None:
+        deadline = time.process_time() + time_limit
+        solver.stop = lambda: time.process_time() > deadline
+    return solver.bt_search(propagator, var_ord, val_ord, iterative=True)
+
+def run_key(run):
+    '''the key identifying the same run in two result files'''
+    return "{puzzle}/{model}/{propagator}/{var_ord}/{val_ord}".format(**run)
+
+def run(entry, model, propagator, var_ord, val_ord, time_limit, memory=True):
+    '''Measure one run; return it as a dict'''
+    name, level, grid = entry
+    args = (grid, lookup(models, model), lookup(propagators, propagator),
+            lookup(heuristics, var_ord), lookup(heuristics, val_ord))
+    result = search(*(args + (time_limit,)))
+    peak = None
+    if memory and result.status != SearchResult.STOPPED:
+        tracemalloc.start()
+        try:
+            search(*(args + (None if time_limit is None else 3 * time_limit,)))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {"puzzle": name, "level": level, "N": len(grid), "model": model,
+            "propagator": propagator, "var_ord": var_ord, "val_ord": val_ord,
+            "status": result.status, "decisions": result.decisions,
+            "prunings": result.prunings, "wall_time": result.wall_time,
+            "cpu_time": result.cpu_time, "peak_memory": peak}
+
+def compare(runs, baseline, tolerance, times=True):
+    '''Return the list of (key, message) regressions of runs with
+       respect to the runs of baseline, leaving CPU times out unless
+       times is true'''
+    base = {run_key(r): r for r in baseline}
+    regressions = []
+    for r in runs:
+        key = run_key(r)
+        b = base.get(key)
+        if b is None:
+            continue
+        if r["status"] == SearchResult.STOPPED and b["status"] != SearchResult.STOPPED:
+            regressions.append((key, "stopped, was {}".format(b["status"])))
+            continue
+        if r["decisions"] > b["decisions"] * (1 + tolerance):
+            regressions.append((key, "decisions {} -> {}".format(b["decisions"], r["decisions"])))
+        if (times and r["cpu_time"] > b["cpu_time"] * (1 + tolerance)
+                and r["cpu_time"] - b["cpu_time"] > MIN_TIME):
+            regressions.append((key, "cpu time {:.3f}s -> {:.3f}s".format(
+                b["cpu_time"], r["cpu_time"])))
+        if (r["peak_memory"] is not None and b["peak_memory"] is not None
+                and r["peak_memory"] > b["peak_memory"] * (1 + tolerance)):
+            regressions.append((key, "peak memory {}KB -> {}KB".format(
+                b["peak_memory"] // 1024, r["peak_memory"] // 1024)))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Benchmark the solvers on the puzzle corpora.")
+    parser.add_argument("--levels", nargs="+", choices=LEVELS,
+                        default=["easy", "medium", "hard", "extreme"])
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=["sudoku_nary_ad"])
+    parser.add_argument("--propagators", nargs="+", choices=PROPAGATORS,
+                        default=["prop_GAC", "prop_GAC_residual"])
+    parser.add_argument("--var-ords", nargs="+", choices=VAR_ORDS, default=VAR_ORDS)
+    parser.add_argument("--val-ords", nargs="+", choices=VAL_ORDS, default=["none"])
+    parser.add_argument("--time-limit", type=float, default=5.0,
+                        help="CPU seconds after which a search is stopped")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the peak memory measurement")
+    parser.add_argument("--out", help="write the runs to this JSON file")
+    parser.add_argument("--baseline", help="compare with the runs of this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative growth allowed before a run regresses")
+    parser.add_argument("--ignore-time", action="store_true",
+                        help="do not compare CPU times (for a baseline made on another machine)")
+    args = parser.parse_args(argv)
+
+    runs = []
+    print("{:<12} {:<15} {:<18} {:<12} {:<18} {:>11} {:>9} {:>10} {:>9} {:>9}".format(
+        "puzzle", "model", "propagator", "var_ord", "val_ord", "status",
+        "decisions", "prunings", "cpu (s)", "peak (KB)"))
+    for entry in corpus(args.levels):
+        for model in args.models:
+            for propagator in args.propagators:
+                for var_ord in args.var_ords:
+                    for val_ord in args.val_ords:
+                        r = run(entry, model, propagator, var_ord, val_ord,
+                                args.time_limit, not args.no_memory)
+                        runs.append(r)
+                        print("{:<12} {:<15} {:<18} {:<12} {:<18} {:>11} {:>9} {:>10} {:>9.3f} {:>9}".format(
+                            r["puzzle"], model, propagator, var_ord, val_ord, r["status"],
+                            r["decisions"], r["prunings"], r["cpu_time"],
+                            "-" if r["peak_memory"] is None else r["peak_memory"] // 1024))
+
+    if args.out:
+        meta = {"date": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "time_limit": args.time_limit}
+        with open(args.out, "w") as f:
+            json.dump({"meta": meta, "runs": runs}, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["runs"]
+        regressions = compare(runs, baseline, args.tolerance, not args.ignore_time)
+        for key, message in regressions:
+            print("REGRESSION", key, message)
+        print("{} runs compared with {}: {} regressions".format(
+            len(runs), args.baseline, len(regressions)))
+        if regressions:
+            return 1
+    return 0
@@ -0,0 +1,65 @@
+import os
+import json
+
+from cspbase import SearchResult
+from benchmarks import runner
+from benchmarks.corpora import corpus
+
+'''
+Checks of the benchmark runner: measuring runs and comparing them with
+a baseline.
+Run with python benchmarks_test.py (or pytest).
+'''
+
+def test_run():
+    entry = corpus(["easy"])[0]
+    r = runner.run(entry, "sudoku_nary_ad", "prop_GAC", "ord_mrv", "none", 5.0)
+    assert r["puzzle"] == "easy-1" and r["N"] == 9
+    assert r["status"] == SearchResult.SOLVED
+    assert r["decisions"] > 0 and r["peak_memory"] > 0
+
+def test_stopped_run_has_no_memory():
+    entry = corpus(["hard"])[0]
+    r = runner.run(entry, "sudoku_nary_ad", "prop_FC", "none", "none", 0.05)
+    assert r["status"] == SearchResult.STOPPED
+    assert r["peak_memory"] is None
+
+def test_compare():
+    base = {"puzzle": "p", "model": "sudoku_nary_ad", "propagator": "prop_GAC",
+            "var_ord": "ord_mrv", "val_ord": "none", "status": SearchResult.SOLVED,
+            "decisions": 100, "cpu_time": 1.0, "peak_memory": 1000}
+    same = dict(base, decisions=110, cpu_time=1.1, peak_memory=1100)
+    assert runner.compare([same], [base], 0.25) == []
+    worse = dict(base, decisions=200, cpu_time=2.0, peak_memory=2048 * 1024)
+    messages = [m for key, m in runner.compare([worse], [base], 0.25)]
+    assert len(messages) == 3 and messages[0] == "decisions 100 -> 200"
+    stopped = dict(base, status=SearchResult.STOPPED)
+    assert runner.compare([stopped], [base], 0.25) == [
+        (runner.run_key(base), "stopped, was solved")]
+    #runs missing from the baseline are not compared
+    other = dict(worse, puzzle="q")
+    assert runner.compare([other], [base], 0.25) == []
+    #nor are CPU times when told so
+    slower = dict(base, cpu_time=2.0)
+    assert runner.compare([slower], [base], 0.25, times=False) == []
+
+def test_stored_baseline():
+    #the baseline in the repository has every run of the default options
+    path = os.path.join(os.path.dirname(runner.__file__), "baseline.json")
+    with open(path) as f:
+        runs = json.load(f)["runs"]
+    keys = {runner.run_key(r) for r in runs}
+    for name, level, grid in corpus(["easy", "medium", "hard", "extreme"]):
+        for propagator in ["prop_GAC", "prop_GAC_residual"]:
+            for var_ord in runner.VAR_ORDS:
+                key = runner.run_key({"puzzle": name, "model": "sudoku_nary_ad",
+                                      "propagator": propagator, "var_ord": var_ord,
+                                      "val_ord": "none"})
+                assert key in keys, key
+    assert all(r["status"] == SearchResult.SOLVED for r in runs)
+
+if __name__ == "__main__":
+    for test in [test_run, test_stopped_run_has_no_memory, test_compare,
+                 test_stored_baseline]:
+        test()
+        print(test.__name__, "passed")
@@ -0,0 +1,94 @@
+from cspbase import *
+from propagators import *
+from heuristics import *
+import itertools
+
+'''
+Checks of FunctionConstraint: a problem stated with function
+constraints must search exactly like the same problem stated with
+table constraints, with or without a support_fn.
+Run with python constraint_test.py (or pytest).
+'''
+
+def queens_ok(qi, qj):
+    '''check function of the constraint between queens qi and qj'''
+    return lambda vals: vals[0] != vals[1] and abs(vals[0] - vals[1]) != abs(qi - qj)
+
+def sum_ok(vals):
+    '''check function of x + y == z'''
+    return vals[0] + vals[1] == vals[2]
+
+def support_of(check):
+    '''a support_fn searching the other variables' current domains for
+       a tuple check accepts, as a specialised support test would'''
+    def support_fn(c, var, val):
+        doms = [[val] if v is var else v.cur_domain() for v in c.scope]
+        return any(check(t) for t in itertools.product(*doms))
+    return support_fn
+
+def problem(kind, n=6):
+    '''Return n-queens with an extra ternary constraint Q1 + Q2 == Q3,
+       stated with constraints of kind "table", "function" or
+       "support_fn"'''
+    dom = list(range(1, n + 1))
+    vars = [Variable('Q{}'.format(i), dom) for i in dom]
+    csp = CSP("{}-Queens-{}".format(n, kind), vars)
+    checks = [("C(Q{},Q{})".format(qi + 1, qj + 1), [vars[qi], vars[qj]], queens_ok(qi, qj))
+              for qi, qj in itertools.combinations(range(n), 2)]
+    checks.append(("Sum", vars[:3], sum_ok))
+    for name, scope, check in checks:
+        if kind == "table":
+            c = Constraint(name, scope)
+            c.add_satisfying_tuples([t for t in itertools.product(dom, repeat=len(scope))
+                                     if check(t)])
+        else:
+            c = FunctionConstraint(name, scope, check,
+                                   support_of(check) if kind == "support_fn" else None)
+        csp.add_constraint(c)
+    return csp
+
+def search(csp, propagator, var_ord=None):
+    '''(solutions, status, decisions, prunings) of BT on csp'''
+    solver = BT(csp)
+    solutions = [[sol[v] for v in csp.vars]
+                 for sol in solver.bt_solutions(propagator, var_ord)]
+    result = solver.bt_search(propagator, var_ord)
+    return solutions, result.status, result.decisions, result.prunings
+
+def test_same_search_as_table():
+    for propagator in [prop_BT, prop_FC, prop_GAC, prop_GAC_residual]:
+        for var_ord in [None, ord_mrv]:
+            expected = search(problem("table"), propagator, var_ord)
+            assert expected[0]
+            for kind in ["function", "support_fn"]:
+                assert search(problem(kind), propagator, var_ord) == expected, \
+                    (kind, propagator.__name__)
+
+def test_count_solutions():
+    #3 queens have no solution
+    for n, count in [(3, 0), (4, 1), (6, 2), (7, 4)]:
+        for kind in ["table", "function", "support_fn"]:
+            for propagator in [prop_BT, prop_FC, prop_GAC]:
+                assert BT(problem(kind, n)).count_solutions(propagator) == count
+
+def test_has_support():
+    table = problem("table")
+    for kind in ["function", "support_fn"]:
+        csp = problem(kind)
+        for c, tc in zip(csp.cons, table.cons):
+            c.scope[0].prune_value(2)
+            tc.scope[0].prune_value(2)
+            for var, tvar in zip(c.scope, tc.scope):
+                for val in var.domain():
+                    assert c.has_support(var, val) == tc.has_support(tvar, val), (c, val)
+            c.scope[0].unprune_value(2)
+            tc.scope[0].unprune_value(2)
+        #a value that is not in the current domain has no support
+        c = csp.cons[0]
+        c.scope[0].prune_value(1)
+        assert not c.has_support(c.scope[0], 1)
+
+if __name__ == "__main__":
+    for test in [test_same_search_as_table, test_count_solutions, test_has_support]:
+        test()
+        print(test.__name__, "passed")
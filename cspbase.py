@@ -1,5 +1,6 @@
 import time
 import functools
+import itertools
 
 '''Constraint Satisfaction Routines
    A) class Variable
@@ -20,6 +21,10 @@ import functools
       This class allows one to define constraints specified by tables
       of satisfying assignments.
 
+      Subclasses (e.g., FunctionConstraint, AllDiffConstraint,
+      CageConstraint) represent a constraint without a table; they
+      provide their own check and has_support.
+
       On initialization the variables the constraint is over is
       specified (i.e. the scope of the constraint). This must be an
       ORDERED list of variables. This list of variables cannot be
@@ -28,9 +33,17 @@ import functools
       Once initialized the constraint can be incrementally initialized
       with a list of satisfying tuples. Each tuple specifies a value
       for each variable in the constraint (in the same ORDER as the
-      variables of the constraint were specified).
+      variables of the constraint were specified). The tuples live in
+      a Relation object, which can instead be built once and shared
+      by all constraints over the same relation.
+
+    C) class Trail
 
-    C) Backtracking routine---takes propagator and CSP as arguments
+      An undo stack of value prunings. Propagators prune through
+      CSP.prune_value, which records each pruning on the CSP's trail,
+      and backtracking pops the trail back to a level marker.
+
+    D) Backtracking routine---takes propagator and CSP as arguments
        so that basic backtracking, forward-checking or GAC can be 
        executed depending on the propagator used.
 
@@ -45,8 +58,10 @@ class Variable:
 
        The variable object offers two types of functionality to support
        search. 
-       (a) It has a current domain, implimented as a set of flags 
-           determining which domain values are "current", i.e., unpruned.
+       (a) It has a current domain, implimented as an integer bitmask
+           (one bit per domain value) determining which domain values are
+           "current", i.e., unpruned. Membership, pruning, unpruning and
+           the current domain size are all constant time.
            - you can prune a value, and restore it.
            - you can obtain a list of values in the current domain, or count
              how many are still there
@@ -80,17 +95,25 @@ class Variable:
         string). Optionally specify the initial domain.
         '''
         self.name = name                #text name for variable
-        self.dom = list(domain)         #Make a copy of passed domain
-        self.curdom = [True] * len(domain)      #using list
+        self.dom = []                   #permanent domain values
+        self.value_bit = dict()         #value --> bit of that value in curdom
+        self.curdom = 0                 #bitmask, bit i set iff dom[i] is current
+        self.curdom_size = 0            #number of bits set in curdom
         #for bt_search
         self.assignedValue = None
+        self.add_domain_values(domain)
 
     def add_domain_values(self, values):
         '''Add additional domain values to the domain
            Removals not supported removals'''
         for val in values: 
+            if val in self.value_bit:
+                continue
+            bit = 1 << len(self.dom)
             self.dom.append(val)
-            self.curdom.append(True)
+            self.value_bit[val] = bit
+            self.curdom |= bit
+            self.curdom_size += 1
 
     def domain_size(self):
         '''Return the size of the (permanent) domain'''
@@ -106,53 +129,64 @@ class Variable:
 
     def prune_value(self, value):
         '''Remove value from CURRENT domain'''
-        self.curdom[self.value_index(value)] = False
+        bit = self.value_bit[value]
+        if self.curdom & bit:
+            self.curdom ^= bit
+            self.curdom_size -= 1
 
     def unprune_value(self, value):
         '''Restore value to CURRENT domain'''
-        self.curdom[self.value_index(value)] = True
+        bit = self.value_bit[value]
+        if not self.curdom & bit:
+            self.curdom |= bit
+            self.curdom_size += 1
 
     def cur_domain(self):
         '''return list of values in CURRENT domain (if assigned 
            only assigned value is viewed as being in current domain)'''
-        vals = []
         if self.is_assigned():
-            vals.append(self.get_assigned_value())
-        else:
-            for i, val in enumerate(self.dom):
-                if self.curdom[i]:
-                    vals.append(val)
-        return vals
+            return [self.assignedValue]
+        if self.curdom_size == len(self.dom):
+            return list(self.dom)
+        mask = self.curdom
+        return [val for i, val in enumerate(self.dom) if mask >> i & 1]
 
     def in_cur_domain(self, value):
         '''check if value is in CURRENT domain (without constructing list)
            if assigned only assigned value is viewed as being in current 
            domain'''
-        if not value in self.dom:
+        bit = self.value_bit.get(value)
+        if bit is None:
             return False
-        if self.is_assigned():
-            return value == self.get_assigned_value()
-        else:
-            return self.curdom[self.value_index(value)]
+        if self.assignedValue is not None:
+            return value == self.assignedValue
+        return self.curdom & bit != 0
 
     def cur_domain_size(self):
         '''Return the size of the variables domain (without construcing list)'''
-        if self.is_assigned():
+        if self.assignedValue is not None:
             return 1
-        else:
-            return(sum(1 for v in self.curdom if v))
+        return self.curdom_size
+
+    def cur_domain_mask(self):
+        '''Return the CURRENT domain as a bitmask over the (permanent)
+           domain: bit i is set iff dom[i] is current. If assigned only
+           the bit of the assigned value is set'''
+        if self.assignedValue is not None:
+            return self.value_bit[self.assignedValue]
+        return self.curdom
 
     def restore_curdom(self):
         '''return all values back into CURRENT domain'''
-        for i in range(len(self.curdom)):
-            self.curdom[i] = True
+        self.curdom = (1 << len(self.dom)) - 1
+        self.curdom_size = len(self.dom)
 
     #
     #methods for assigning and unassigning
     #
 
     def is_assigned(self):
-        return self.assignedValue != None
+        return self.assignedValue is not None
     
     def assign(self, value):
         '''Used by bt_search. When we assign we remove all other values
@@ -184,7 +218,7 @@ class Variable:
     def value_index(self, value):
         '''Domain values need not be numbers, so return the index
            in the domain list of a variable value'''
-        return self.dom.index(value)
+        return self.value_bit[value].bit_length() - 1
 
     def __repr__(self):
         return("Var-{}".format(self.name))
@@ -196,14 +230,57 @@ class Variable:
         '''Also print the variable domain and current domain'''
         print("Var--\"{}\": Dom = {}, CurDom = {}".format(self.name, 
                                                              self.dom, 
-                                                             self.curdom))
+                                                             self.cur_domain()))
+class Relation:
+    '''Table of satisfying tuples for constraints of a given arity.
+
+       Tuples are stored once, as a set of satisfying tuples plus, to
+       support GAC propagation, a dict mapping a scope position and a
+       value to the list of satisfying tuples with that value at that
+       position. As positions are relative to the scope, one Relation
+       can be shared by every constraint over the same relation (e.g.,
+       all the not-equal constraints of a sudoku). A Relation should
+       not be changed once constraints share it.'''
+
+    def __init__(self, arity, tuples=()):
+        self.arity = arity
+        self.sat_tuples = set()
+        self.sup_tuples = dict()
+        self.add_tuples(tuples)
+
+    def add_tuples(self, tuples):
+        '''Add satisfying tuples (each a sequence of arity values)'''
+        for x in tuples:
+            t = tuple(x)  #ensure we have an immutable tuple
+            if t in self.sat_tuples:
+                continue
+            self.sat_tuples.add(t)
+            #now put t in as a support for all of the values in it
+            for i, val in enumerate(t):
+                sup = self.sup_tuples.get((i, val))
+                if sup is None:
+                    self.sup_tuples[(i, val)] = [t]
+                else:
+                    sup.append(t)
+
+    def copy(self):
+        '''return a Relation with the same tuples that can be extended
+           independently of this one'''
+        rel = Relation(self.arity)
+        rel.sat_tuples = set(self.sat_tuples)
+        rel.sup_tuples = {k: list(ts) for k, ts in self.sup_tuples.items()}
+        return rel
+
+    def __len__(self):
+        return len(self.sat_tuples)
+
 class Constraint: 
     '''Class for defining constraints variable objects specifes an
        ordering over variables.  This ordering is used when calling
        the satisfied function which tests if an assignment to the
        variables in the constraint's scope satisfies the constraint'''
 
-    def __init__(self, name, scope): 
+    def __init__(self, name, scope, relation=None): 
         '''create a constraint object, specify the constraint name (a
         string) and its scope (an ORDERED list of variable objects).
         The order of the variables in the scope is critical to the
@@ -212,36 +289,51 @@ class Constraint:
         Consraints are implemented as storing a set of satisfying
         tuples (i.e., each tuple specifies a value for each variable
         in the scope such that this sequence of values satisfies the
-        constraints).
-
-        NOTE: This is a very space expensive representation...a proper
-        constraint object would allow for representing the constraint
-        with a function.  
+        constraints). The tuples are kept in a Relation object, which
+        can be passed in here (or with set_relation) to share one
+        table among all constraints over the same relation.
+
+        NOTE: This is a very space expensive representation unless the
+        relation is shared...a proper constraint object would allow
+        for representing the constraint with a function (see
+        FunctionConstraint).
         '''
 
         self.scope = list(scope)
         self.name = name
-        self.sat_tuples = dict()
-
-        #The next object data item 'sup_tuples' will be used to help
-        #support GAC propgation. It allows access to a list of 
-        #satisfying tuples that contain a particular variable/value
-        #pair.
-        self.sup_tuples = dict()
+        #position of each variable in the scope; relations index their
+        #supports by scope position rather than by variable
+        self.var_pos = {var: i for i, var in enumerate(self.scope)}
+        self.relation = None
+        self.own_relation = False   #False while the relation may be shared
+        #conflict weight, bumped by the propagators every time this
+        #constraint causes a dead end (used by dom/wdeg ordering)
+        self.weight = 1
+        #last support found for each (scope position, value), as an
+        #index into the relation's support list (see prop_GAC_residual)
+        self.residues = dict()
+        if relation is not None:
+            self.set_relation(relation)
+
+    def set_relation(self, relation):
+        '''Use relation (a Relation of the same arity as the scope) as
+           the table of satisfying tuples. The relation is not copied,
+           so it can be shared by any number of constraints.'''
+        if relation.arity != len(self.scope):
+            print("Relation of arity", relation.arity, "does not fit constraint", self)
+            return
+        self.relation = relation
+        self.own_relation = False
 
     def add_satisfying_tuples(self, tuples):
         '''We specify the constraint by adding its complete list of satisfying tuples.'''
-        for x in tuples:
-            t = tuple(x)  #ensure we have an immutable tuple
-            if not t in self.sat_tuples:
-                self.sat_tuples[t] = True
-
-            #now put t in as a support for all of the variable values in it
-            for i, val in enumerate(t):
-                var = self.scope[i]
-                if not (var,val) in self.sup_tuples:
-                    self.sup_tuples[(var,val)] = []
-                self.sup_tuples[(var,val)].append(t)
+        if self.relation is None:
+            self.relation = Relation(len(self.scope))
+        elif not self.own_relation:
+            #never modify a relation other constraints may be sharing
+            self.relation = self.relation.copy()
+        self.own_relation = True
+        self.relation.add_tuples(tuples)
 
     def get_scope(self):
         '''get list of variables the constraint is over'''
@@ -254,7 +346,7 @@ class Constraint:
            constraints "satisfies" function.  Note the list of values
            are must be ordered in the same order as the list of
            variables in the constraints scope'''
-        return tuple(vals) in self.sat_tuples
+        return self.relation is not None and tuple(vals) in self.relation.sat_tuples
 
     def get_n_unasgn(self):
         '''return the number of unassigned variables in the constraint's scope'''
@@ -278,23 +370,451 @@ class Constraint:
            of assignments satisfying the constraint where each value is
            still in the corresponding variables current domain
         '''
-        if (var, val) in self.sup_tuples:
-            for t in self.sup_tuples[(var, val)]:
-                if self.tuple_is_valid(t):
-                    return True
-        return False
+        return self.find_support(var, val) is not None
+
+    def find_support(self, var, val):
+        '''return a supporting tuple of the variable value pair (see
+           has_support), or None if there is none'''
+        if self.relation is None:
+            return None
+        for t in self.relation.sup_tuples.get((self.var_pos.get(var), val), ()):
+            if self.tuple_is_valid(t):
+                return t
+        return None
+
+    def count_supports(self, counts):
+        '''Add to counts[(var, val)] the number of values of the other
+           variables var=val supports in the current domains (see
+           CSP.support_counts). Only constraints without a table, whose
+           support tests produce no supporting tuple, need to; this one
+           counts nothing.'''
+        pass
 
     def tuple_is_valid(self, t):
         '''Internal routine. Check if every value in tuple is still in
            corresponding variable domains'''
-        for i, var in enumerate(self.scope):
-            if not var.in_cur_domain(t[i]):
+        for var, val in zip(self.scope, t):
+            if not var.in_cur_domain(val):
                 return False
         return True
 
     def __str__(self):
         return("{}({})".format(self.name,[var.name for var in self.scope]))
 
+class FunctionConstraint(Constraint):
+    '''Constraint given by a function instead of a table of satisfying
+       tuples (an intensional constraint).
+
+       check_fn(vals) gets a sequence of values, one for each variable
+       in the scope (in scope order), and returns True iff they
+       satisfy the constraint.
+
+       support_fn(constraint, var, val) is optional. If given it is
+       used by has_support and must return True iff var=val can be
+       extended to values in the current domains of the other
+       variables that satisfy the constraint. Without it has_support
+       searches the current domains, calling check_fn on each
+       candidate tuple, which is only practical for small scopes.'''
+
+    def __init__(self, name, scope, check_fn, support_fn=None):
+        Constraint.__init__(self, name, scope)
+        self.check_fn = check_fn
+        self.support_fn = support_fn
+
+    def check(self, vals):
+        return bool(self.check_fn(vals))
+
+    def has_support(self, var, val):
+        '''Test if a variable value pair has a supporting tuple (a set
+           of assignments satisfying the constraint where each value is
+           still in the corresponding variables current domain
+        '''
+        if not var.in_cur_domain(val):
+            return False
+        if self.support_fn is not None:
+            return self.support_fn(self, var, val)
+        doms = []
+        for v in self.scope:
+            if v is var:
+                doms.append((val,))
+            else:
+                doms.append(v.cur_domain())
+        for t in itertools.product(*doms):
+            if self.check_fn(t):
+                return True
+        return False
+
+class FilteredConstraint(Constraint):
+    '''Base class of the constraints without a table whose filter
+       computes the supports of all variable/value pairs at once. The
+       result is cached and reused for as long as it is still valid
+       for the current domains. Subclasses provide check and
+       filter(doms).'''
+
+    def __init__(self, name, scope):
+        Constraint.__init__(self, name, scope)
+        #domain masks the cached filtering was computed from, and for
+        #each variable the mask of its values that are supported
+        self.filtered_doms = None
+        self.supported = None
+
+    def has_support(self, var, val):
+        '''Test if a variable value pair has a supporting tuple in the
+           current domains of the other variables'''
+        bit = var.value_bit.get(val)
+        if bit is None or not var in self.var_pos:
+            return False
+        doms = [v.cur_domain_mask() for v in self.scope]
+        if not self.filter_is_valid(doms):
+            self.filter(doms)
+        return self.supported[self.var_pos[var]] & bit != 0
+
+    def filter_is_valid(self, doms):
+        '''The cached supports remain exact as long as the domains have
+           only lost values that were not supported'''
+        if self.filtered_doms is None:
+            return False
+        for dom, old, sup in zip(doms, self.filtered_doms, self.supported):
+            if dom & ~old or sup & ~dom:
+                return False
+        return True
+
+    def filter(self, doms):
+        '''Compute self.supported, the mask of supported values of every
+           variable, for the domain masks doms'''
+        raise NotImplementedError
+
+class AllDiffConstraint(FilteredConstraint):
+    '''n-ary all-different constraint: every variable in the scope
+       must take a different value.
+
+       No table of satisfying tuples is stored. has_support uses the
+       matching-based filter of Regin (1994): a value is supported iff
+       the variable-value edge belongs to some maximum matching of the
+       bipartite variable/value graph of the current domains.'''
+
+    def check(self, vals):
+        '''True iff the values are pairwise different'''
+        return len(set(vals)) == len(vals)
+
+    def filter(self, doms):
+        '''Internal routine. Compute the supported values of every
+           variable for the domain masks doms (Regin's algorithm)'''
+        n = len(self.scope)
+        self.filtered_doms = doms
+        vals = [[val for j, val in enumerate(var.dom) if doms[i] >> j & 1]
+                for i, var in enumerate(self.scope)]
+
+        #maximum matching variables --> values by augmenting paths
+        match_var = [None] * n
+        match_val = dict()
+        for i in range(n):
+            if not self.augment(i, vals, match_var, match_val, set()):
+                #fewer values than variables: nothing is supported
+                self.supported = [0] * n
+                return
+
+        #value graph node ids: variables are 0..n-1, values follow
+        val_node = dict()
+        for vs in vals:
+            for val in vs:
+                if not val in val_node:
+                    val_node[val] = n + len(val_node)
+        users = [[] for k in range(len(val_node))]
+        for i, vs in enumerate(vals):
+            for val in vs:
+                if match_var[i] != val:
+                    users[val_node[val] - n].append(i)
+        #matched edges go variable --> value, the others value --> variable
+        succ = [[val_node[match_var[i]]] for i in range(n)] + users
+
+        #values reachable from a free value by an alternating path
+        reached = [False] * len(succ)
+        stack = [node for val, node in val_node.items() if not val in match_val]
+        for node in stack:
+            reached[node] = True
+        while stack:
+            node = stack.pop()
+            for nxt in succ[node]:
+                if not reached[nxt]:
+                    reached[nxt] = True
+                    stack.append(nxt)
+
+        scc = self.components(succ)
+        supported = []
+        for i, var in enumerate(self.scope):
+            mask = 0
+            for val in vals[i]:
+                node = val_node[val]
+                if match_var[i] == val or reached[node] or scc[node] == scc[i]:
+                    mask |= var.value_bit[val]
+            supported.append(mask)
+        self.supported = supported
+
+    def count_supports(self, counts):
+        '''Add to counts[(var, val)] the number of supported values of
+           the other variables that differ from val'''
+        doms = [v.cur_domain_mask() for v in self.scope]
+        if not self.filter_is_valid(doms):
+            self.filter(doms)
+        vals = [[val for val in var.dom if sup & var.value_bit[val]]
+                for var, sup in zip(self.scope, self.supported)]
+        total = sum(len(vs) for vs in vals)
+        users = dict()      #value -> number of variables it is supported for
+        for vs in vals:
+            for val in vs:
+                users[val] = users.get(val, 0) + 1
+        for var, vs in zip(self.scope, vals):
+            if var.is_assigned():
+                continue
+            others = total - len(vs)
+            for val in vs:
+                counts[(var, val)] = counts.get((var, val), 0) + others - users[val] + 1
+
+    def augment(self, i, vals, match_var, match_val, seen):
+        '''Internal routine. Look for an augmenting path from variable
+           i, updating the matching if one is found'''
+        for val in vals[i]:
+            if not val in seen:
+                seen.add(val)
+                j = match_val.get(val)
+                if j is None or self.augment(j, vals, match_var, match_val, seen):
+                    match_var[i] = val
+                    match_val[val] = i
+                    return True
+        return False
+
+    @staticmethod
+    def components(succ):
+        '''Internal routine. Label the strongly connected components of
+           the graph given by successor lists (iterative Tarjan)'''
+        index = [None] * len(succ)
+        low = [0] * len(succ)
+        comp = [None] * len(succ)
+        on_stack = [False] * len(succ)
+        stack = []
+        counter = 0
+        ncomp = 0
+        for root in range(len(succ)):
+            if index[root] is not None:
+                continue
+            work = [(root, 0)]
+            while work:
+                node, k = work.pop()
+                if k == 0:
+                    index[node] = low[node] = counter
+                    counter += 1
+                    stack.append(node)
+                    on_stack[node] = True
+                elif k <= len(succ[node]):
+                    child = succ[node][k - 1]
+                    low[node] = min(low[node], low[child])
+                while k < len(succ[node]):
+                    child = succ[node][k]
+                    k += 1
+                    if index[child] is None:
+                        work.append((node, k))
+                        work.append((child, 0))
+                        break
+                    elif on_stack[child]:
+                        low[node] = min(low[node], index[child])
+                else:
+                    if low[node] == index[node]:
+                        while True:
+                            top = stack.pop()
+                            on_stack[top] = False
+                            comp[top] = ncomp
+                            if top == node:
+                                break
+                        ncomp += 1
+        return comp
+
+class CageConstraint(FilteredConstraint):
+    '''Arithmetic cage (room) constraint: op applied to the values of
+       the scope gives target. The values must be positive integers.
+       op is one of
+
+           "sum"         the values add up to target
+           "product"     the values multiply to target
+           "difference"  the largest value minus the sum of the others
+                         is target
+           "division"    the largest value divided by the product of
+                         the others is target
+           "min"         the smallest value is target
+           "max"         the largest value is target
+
+       No table of satisfying tuples is stored. The filter computes,
+       for every variable, the set of sums (or products) the other
+       variables can reach in their current domains, one variable at a
+       time and cut at the bounds the target allows; a value is
+       supported iff the sum or product it needs is reachable. This is
+       exact, so the cage is made GAC, and costs about the cage size
+       times the number of reachable sums times the domain size.'''
+
+    OPS = ("sum", "product", "difference", "division", "min", "max")
+
+    def __init__(self, name, scope, op, target):
+        if not op in self.OPS:
+            raise ValueError("unknown cage operation {!r}".format(op))
+        FilteredConstraint.__init__(self, name, scope)
+        self.op = op
+        self.target = target
+
+    def check(self, vals):
+        '''True iff op applied to vals gives the target'''
+        op = self.op
+        if op == "sum":
+            return sum(vals) == self.target
+        if op == "min":
+            return min(vals) == self.target
+        if op == "max":
+            return max(vals) == self.target
+        if op == "product":
+            return self.prod(vals) == self.target
+        largest = sorted(vals)[-1]
+        rest = list(vals)
+        rest.remove(largest)
+        if op == "difference":
+            return largest - sum(rest) == self.target
+        return largest == self.target * self.prod(rest)
+
+    @staticmethod
+    def prod(vals):
+        p = 1
+        for val in vals:
+            p *= val
+        return p
+
+    def reach(self, lists, limit):
+        '''Internal routine. The set of sums (products for the
+           multiplicative ops) of one value from each list, cut at
+           limit'''
+        if self.op in ("sum", "difference"):
+            reached = {0}
+            for vals in lists:
+                reached = {r + val for r in reached for val in vals if r + val <= limit}
+        else:
+            reached = {1}
+            for vals in lists:
+                reached = {r * val for r in reached for val in vals if r * val <= limit}
+        return reached
+
+    def filter(self, doms):
+        '''Internal routine. Compute the supported values of every
+           variable for the domain masks doms'''
+        n = len(self.scope)
+        self.filtered_doms = doms
+        vals = [[val for j, val in enumerate(var.dom) if doms[i] >> j & 1]
+                for i, var in enumerate(self.scope)]
+        op = self.op
+        t = self.target
+        others = lambda *skip: [vs for k, vs in enumerate(vals) if not k in skip]
+        supported = [0] * n
+        for i, var in enumerate(self.scope):
+            if op == "min" or op == "max":
+                fits = (lambda v: v >= t) if op == "min" else (lambda v: v <= t)
+                rest = others(i)
+                if not all(any(fits(v) for v in vs) for vs in rest):
+                    continue
+                hit = any(t in vs for vs in rest)
+                ok = [val for val in vals[i] if val == t or (hit and fits(val))]
+            elif op == "sum":
+                rest = self.reach(others(i), t)
+                ok = [val for val in vals[i] if t - val in rest]
+            elif op == "product":
+                rest = self.reach(others(i), t)
+                ok = [val for val in vals[i] if t % val == 0 and t // val in rest]
+            else:
+                #the largest value x_m is t + the sum (t * the product) of
+                #the others; var is either that value or one of the others
+                top = max((max(vs) for vs in vals if vs), default=0)
+                ok = set()
+                rest = self.reach(others(i), top)
+                for val in vals[i]:
+                    if (val - t in rest if op == "difference"
+                            else val % t == 0 and val // t in rest):
+                        ok.add(val)
+                for m in range(n):
+                    if m == i:
+                        continue
+                    rest = self.reach(others(i, m), top)
+                    for val in vals[i]:
+                        if val in ok:
+                            continue
+                        for x in vals[m]:
+                            if op == "difference":
+                                need = x - t - val
+                                if need in rest:
+                                    ok.add(val)
+                                    break
+                            elif x % (t * val) == 0 and x // (t * val) in rest:
+                                ok.add(val)
+                                break
+            mask = 0
+            for val in ok:
+                mask |= var.value_bit[val]
+            supported[i] = mask
+        self.supported = supported
+
+class Trail:
+    '''Undo stack of value prunings shared by BT and the propagators.
+
+       Prunings are recorded in two preallocated parallel arrays (the
+       pruned variable and the pruned value) plus a stack of level
+       markers. Backtracking a level just pops the arrays back to the
+       last marker, unpruning the values above it, so no per-node
+       lists of prunings need to be allocated.'''
+
+    def __init__(self, capacity=0):
+        '''Create an empty trail with room for capacity prunings'''
+        self.vars = [None] * capacity
+        self.vals = [None] * capacity
+        self.top = 0        #number of prunings on the trail
+        self.marks = []     #trail positions where each level starts
+
+    def reserve(self, capacity):
+        '''Make sure capacity prunings fit without growing the arrays'''
+        extra = capacity - len(self.vars)
+        if extra > 0:
+            self.vars.extend([None] * extra)
+            self.vals.extend([None] * extra)
+
+    def push(self, var, val):
+        '''Record that val has been pruned from var's current domain'''
+        top = self.top
+        if top == len(self.vars):
+            self.reserve(2 * top + 16)
+        self.vars[top] = var
+        self.vals[top] = val
+        self.top = top + 1
+
+    def mark(self):
+        '''Open a new level. Everything pruned from now on is restored
+           by the matching call to undo()'''
+        self.marks.append(self.top)
+
+    def undo(self):
+        '''Close the current level, restoring every value pruned since
+           the matching mark()'''
+        self.undo_to(self.marks.pop())
+
+    def undo_to(self, pos):
+        '''Restore every value pruned after trail position pos'''
+        vars = self.vars
+        vals = self.vals
+        for i in range(self.top - 1, pos - 1, -1):
+            vars[i].unprune_value(vals[i])
+        self.top = pos
+
+    def clear(self):
+        '''Restore every value on the trail and drop all level markers'''
+        self.undo_to(0)
+        self.marks = []
+
+    def records(self, pos=0):
+        '''return list of (var, val) pairs pruned after trail position pos'''
+        return list(zip(self.vars[pos:self.top], self.vals[pos:self.top]))
+
 class CSP:
     '''Class for packing up a set of variables into a CSP problem.
        Contains various utility routines for accessing the problem.
@@ -309,6 +829,26 @@ class CSP:
         self.vars = []
         self.cons = []
         self.vars_to_cons = dict()
+        #every pruning made through prune_value is recorded here so
+        #that it can be undone, by any solver working on this CSP.
+        self.trail = Trail()
+        #variables the last search on this CSP was free to assign, and
+        #the number of trail levels open before it started (None if
+        #its prunings have been undone already)
+        self.search_vars = []
+        self.search_level = None
+        #optional index of the unassigned variables by current domain
+        #size (see heuristics.py). It is told about every pruning made
+        #through prune_value and about variables search unassigns.
+        self.size_index = None
+        #optional value statistics gathered during search for value
+        #ordering (see heuristics.py); None when not being gathered.
+        #support_counts[(var, val)]: values of other variables var=val
+        #was found to support by the propagator since the last decision.
+        #prune_counts[(var, val)]: values pruned by the propagator the
+        #last time search tried var=val.
+        self.support_counts = None
+        self.prune_counts = None
         for v in vars:
             self.add_var(v)
 
@@ -326,7 +866,7 @@ class CSP:
     def add_constraint(self,c):
         '''Add constraint to CSP. Note that all variables in the 
            constraints scope must already have been added to the CSP'''
-        if not type(c) is Constraint:
+        if not isinstance(c, Constraint):
             print("Trying to add non constraint ", c, " to CSP object")
         else:
             for v in c.scope:
@@ -336,6 +876,26 @@ class CSP:
                 self.vars_to_cons[v].append(c)
             self.cons.append(c)
 
+    def prune_value(self, var, val):
+        '''Prune val from var's current domain, recording the pruning
+           on the CSP's trail so that it is undone on backtrack. This is
+           how propagators should prune values.'''
+        var.prune_value(val)
+        self.trail.push(var, val)
+        if self.size_index is not None:
+            self.size_index.update(var)
+
+    def check_assigned(self):
+        '''Return False if a constraint whose variables are all assigned
+           (e.g., by clues) is violated, bumping its weight, and True
+           otherwise. No propagator looks at such constraints.'''
+        for c in self.cons:
+            if c.get_n_unasgn() == 0:
+                if not c.check([var.get_assigned_value() for var in c.scope]):
+                    c.weight += 1
+                    return False
+        return True
+
     def get_all_cons(self):
         '''return list of all constraints in the CSP'''
         return self.cons
@@ -364,6 +924,60 @@ class CSP:
             print(v, " = ", v.get_assigned_value(), "    ", end='')
         print("")
 
+class SearchResult:
+    '''Outcome of a bt_search call.
+
+       status      == SearchResult.SOLVED, SearchResult.NO_SOLUTION or
+                      SearchResult.STOPPED (the search was stopped by
+                      BT.stop before it could finish)
+       assignment  == dict mapping each Variable of the CSP to its value
+                      (empty if no solution was found)
+       decisions   == number of variable assignments made during search
+       prunings    == number of values pruned during search
+       wall_time   == elapsed wall-clock seconds
+       cpu_time    == CPU seconds used by the search process'''
+
+    SOLVED = "solved"
+    NO_SOLUTION = "no_solution"
+    STOPPED = "stopped"
+
+    def __init__(self, status, assignment, decisions, prunings,
+                 wall_time, cpu_time):
+        self.status = status
+        self.assignment = assignment
+        self.decisions = decisions
+        self.prunings = prunings
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+
+    def solved(self):
+        '''return True if a solution was found'''
+        return self.status == SearchResult.SOLVED
+
+    def value(self, var):
+        '''return the value var has in the solution (None if none)'''
+        return self.assignment.get(var)
+
+    def grid(self, var_array):
+        '''return the solution laid out like var_array (a list of
+           lists of Variables, as returned by the models), i.e., as a
+           list of lists of values'''
+        return [[self.assignment.get(var) for var in row] for row in var_array]
+
+    def as_dict(self):
+        '''return the result as a plain dict (variables by name),
+           e.g., for serializing'''
+        return {"status": self.status,
+                "assignment": {var.name: val for var, val in self.assignment.items()},
+                "decisions": self.decisions,
+                "prunings": self.prunings,
+                "wall_time": self.wall_time,
+                "cpu_time": self.cpu_time}
+
+    def __repr__(self):
+        return("SearchResult({}, decisions={}, prunings={}, cpu_time={:.6f})".format(
+            self.status, self.decisions, self.prunings, self.cpu_time))
+
 ########################################################
 # Backtracking Routine                                 #
 ########################################################
@@ -384,9 +998,14 @@ class BT:
         self.nDecisions = 0 #nDecisions is the number of variable 
                             #assignments made during search
         self.nPrunings  = 0 #nPrunings is the number of value prunings during search
-        unasgn_vars = list() #used to track unassigned variables
+        self.unasgn_vars = list() #used to track unassigned variables
         self.TRACE = False
         self.runtime = 0
+        self.stop = None    #optional function polled before every decision;
+                            #search gives up as soon as it returns True
+        self.stopped = False
+        self.monitor = None #optional monitor.Monitor told about every
+                            #decision, failure, backtrack and solution
 
     def trace_on(self):
         '''Turn search trace on'''
@@ -407,6 +1026,11 @@ class BT:
         print("Search made {} variable assignments and pruned {} variable values".format(
             self.nDecisions, self.nPrunings))
 
+    @property
+    def trail(self):
+        '''The CSP's trail: undo stack of prunings, one level per decision'''
+        return self.csp.trail
+
     def restoreValues(self,prunings):
         '''Restore list of values to variable domains
            each item in prunings is a pair (var, val)'''
@@ -420,11 +1044,56 @@ class BT:
                 var.unassign()
             var.restore_curdom()
 
+    def undo_search(self):
+        '''Undo the assignments made by the previous search on the CSP
+           (by this or any other solver) and restore every value it
+           pruned. Variables that were already assigned when that search
+           started (e.g., clues set by a model), and values pruned on the
+           CSP's trail before it, are left alone.'''
+        csp = self.csp
+        for var in csp.search_vars:
+            if var.is_assigned():
+                var.unassign()
+        csp.search_vars = []
+        self.undo_prunings()
+
+    def undo_prunings(self):
+        '''Restore the values pruned by the last search on the CSP,
+           popping the trail back to the level it started at'''
+        csp = self.csp
+        if csp.search_level is not None:
+            trail = csp.trail
+            while len(trail.marks) > csp.search_level:
+                trail.undo()
+            csp.search_level = None
+
+    def trail_prunings(self, prunings):
+        '''Push a list of (var, val) prunings returned by a propagator
+           that pruned values directly (instead of through
+           csp.prune_value) onto the trail so they are undone too'''
+        size_index = self.csp.size_index
+        for var, val in prunings:
+            self.trail.push(var, val)
+            if size_index is not None:
+                size_index.update(var)
+            if self.monitor is not None:
+                self.monitor.prune(var, val)
+
+    def should_stop(self):
+        '''Return True if the search has to be abandoned because
+           self.stop() returned True (now or earlier in this search)'''
+        if not self.stopped and self.stop():
+            self.stopped = True
+        return self.stopped
+
     def restoreUnasgnVar(self, var):
         '''Add variable back to list of unassigned vars'''
         self.unasgn_vars.append(var)
+        if self.csp.size_index is not None:
+            self.csp.size_index.update(var)
         
-    def bt_search(self,propagator,var_ord=None,val_ord=None):
+    def bt_search(self,propagator,var_ord=None,val_ord=None,iterative=False,
+                  verbose=False):
         '''Try to solve the CSP using specified propagator routine
 
            propagator == a function with the following template
@@ -448,51 +1117,168 @@ class BT:
              in this case bt_search will backtrack
            return is true if we can continue.
 
-           The list of variable values pairs are all of the values
-           the propagator pruned (using the variable's prune_value method). 
-           bt_search NEEDS to know this in order to correctly restore these 
-           values when it undoes a variable assignment.
+           Propagators should prune values with csp.prune_value(var, val),
+           which records each pruning on the CSP's trail; bt_search
+           then restores them by popping the trail when it undoes a
+           variable assignment, and the returned list can be empty.
+           A propagator that prunes with the variable's own prune_value
+           method must instead return the pruned (Variable, Value) pairs
+           so that bt_search can put them on the trail itself.
 
            NOTE propagator SHOULD NOT prune a value that has already been 
            pruned! Nor should it prune a value twice
 
+           Variables that are already assigned when bt_search is called
+           (e.g., clues) are left assigned. The assignments made by a
+           previous call are undone first.
+
            var_ord is the variable ordering function currently being used; 
            val_ord is the value ordering function currently being used.
+
+           iterative selects the explicit-stack search engine (bt_iterate)
+           instead of the recursive one (bt_recurse). Both explore the
+           same tree in the same order; the iterative engine avoids a
+           Python frame per decision and is not limited in depth by the
+           recursion limit, which matters on CSPs with many variables.
+
+           If self.stop is set, it is called before every decision and
+           the search is abandoned when it returns True; the result
+           then has status SearchResult.STOPPED.
+
+           Returns a SearchResult with the status, the solution (if any),
+           the search statistics and the wall/CPU time used. Nothing is
+           printed unless verbose is True, in which case the outcome,
+           the solution and the statistics are printed as well.
            '''
 
-        self.clear_stats()
         stime = time.process_time()
+        wtime = time.perf_counter()
+        if self.monitor is not None:
+            propagator = self.monitor.timed(propagator)
+
+        status = self.start_search(propagator)
+
+        if status == False:
+            if verbose:
+                print("CSP{} detected contradiction at root".format(
+                    self.csp.name))
+        elif iterative:
+            status = self.bt_iterate(propagator, var_ord, val_ord)
+        else:
+            status = self.bt_recurse(propagator, var_ord, val_ord, 1)   #now do recursive search
+
+        self.undo_prunings()
+        self.runtime = time.process_time() - stime
+        if status:
+            result = SearchResult(SearchResult.SOLVED,
+                                  {v: v.get_assigned_value() for v in self.csp.vars},
+                                  self.nDecisions, self.nPrunings,
+                                  time.perf_counter() - wtime, self.runtime)
+        else:
+            result = SearchResult(SearchResult.STOPPED if self.stopped
+                                  else SearchResult.NO_SOLUTION, {},
+                                  self.nDecisions, self.nPrunings,
+                                  time.perf_counter() - wtime, self.runtime)
+
+        if verbose:
+            if self.stopped:
+                print("CSP{} search stopped".format(self.csp.name))
+            elif status == False:
+                print("CSP{} unsolved. Has no solutions".format(self.csp.name))
+            if status == True:
+                print("CSP {} solved. CPU Time used = {}".format(self.csp.name,
+                                                                 self.runtime))
+                self.csp.print_soln()
+
+            print("bt_search finished")
+            self.print_stats()
+        return result
+
+    def start_search(self, propagator):
+        '''Set up a new search: undo the previous one, open a trail
+           level for it, collect the unassigned variables, check the
+           constraints the variables assigned already (e.g., clues) fill
+           and propagate before any assignment. Return False if that
+           finds a contradiction.'''
+        self.clear_stats()
+        self.stopped = False
+
+        self.undo_search()
+        trail = self.trail
+        self.csp.search_level = len(trail.marks)
+        trail.mark()
+        self.csp.size_index = None  #rebuilt on demand by var_ord
+        trail.reserve(trail.top + sum(v.domain_size() for v in self.csp.vars))
 
-        self.restore_all_variable_domains()
-        
         self.unasgn_vars = []
         for v in self.csp.vars:
             if not v.is_assigned():
                 self.unasgn_vars.append(v)
+        self.csp.search_vars = list(self.unasgn_vars)
 
+        if not self.csp.check_assigned():
+            if self.TRACE:
+                print("Assigned variables violate a constraint")
+            return False
+        if self.csp.support_counts is not None:
+            self.csp.support_counts.clear()
         status, prunings = propagator(self.csp) #initial propagate no assigned variables.
-        self.nPrunings = self.nPrunings + len(prunings)
+        self.trail_prunings(prunings)
+        self.nPrunings = self.nPrunings + trail.top - trail.marks[-1]
 
         if self.TRACE:
             print(len(self.unasgn_vars), " unassigned variables at start of search")
-            print("Root Prunings: ", prunings)
-
-        if status == False:
-            print("CSP{} detected contradiction at root".format(
-                self.csp.name))
-        else:
-            status = self.bt_recurse(propagator, var_ord, val_ord, 1)   #now do recursive search
-
-        self.restoreValues(prunings)
-        if status == False:
-            print("CSP{} unsolved. Has no solutions".format(self.csp.name))
-        if status == True:
-            print("CSP {} solved. CPU Time used = {}".format(self.csp.name,
-                                                             time.process_time() - stime))
-            self.csp.print_soln()
+            print("Root Prunings: ", trail.records(trail.marks[-1]))
+        return status
+
+    def bt_solutions(self, propagator, var_ord=None, val_ord=None, limit=None):
+        '''Generator of the solutions of the CSP, found by the search
+           bt_search(propagator, var_ord, val_ord, iterative=True) does.
+           Each solution is yielded as a dict mapping every Variable to
+           its value; while the generator is suspended the variables are
+           assigned to it. Asking for the next solution backtracks from
+           the current one, so nothing is propagated again.
+
+           At most limit solutions are generated (all of them if limit is
+           None); after the last one the variables stay assigned to it, as
+           after bt_search. If the generator is closed before that, the
+           search is undone as by undo_search. Either way every value it
+           pruned is restored. The statistics (nDecisions, nPrunings)
+           cover the search so far.'''
+        if limit is not None and limit < 1:
+            return
+        stime = time.process_time()
+        if self.monitor is not None:
+            propagator = self.monitor.timed(propagator)
+        finished = False
+        try:
+            if not self.start_search(propagator):
+                finished = True
+                return
+            n = 0
+            for solution in self.bt_walk(propagator, var_ord, val_ord):
+                n += 1
+                self.runtime = time.process_time() - stime
+                if limit is not None and n >= limit:
+                    finished = True
+                yield {v: v.get_assigned_value() for v in self.csp.vars}
+                if finished:
+                    return
+            finished = True
+        finally:
+            if finished:
+                self.undo_prunings()
+            else:
+                self.undo_search()
 
-        print("bt_search finished")
-        self.print_stats()
+    def count_solutions(self, propagator, var_ord=None, val_ord=None, limit=None):
+        '''Return the number of solutions of the CSP, counting no
+           further than limit (e.g., limit=2 tells whether a solution is
+           unique).'''
+        n = 0
+        for solution in self.bt_solutions(propagator, var_ord, val_ord, limit):
+            n += 1
+        return n
 
     def bt_recurse(self, propagator, var_ord, val_ord, level):
         '''Return true if found solution. False if still need to search.
@@ -503,6 +1289,8 @@ class BT:
            
         if not self.unasgn_vars:
             #all variables assigned
+            if self.monitor is not None:
+                self.monitor.solution()
             return True
         else:
             ##Figure out which variable to assign,
@@ -522,29 +1310,148 @@ class BT:
               value_order = var.cur_domain()
 
             for val in value_order:
+                if self.stop is not None and self.should_stop():
+                    break
 
                 if self.TRACE:
                     print('  ' * level, "bt_recurse trying", var, "=", val)
 
                 var.assign(val)
                 self.nDecisions = self.nDecisions+1
+                if self.monitor is not None:
+                    self.monitor.decision(var, val, level)
 
+                self.trail.mark()
+                if self.csp.support_counts is not None:
+                    self.csp.support_counts.clear()
                 status, prunings = propagator(self.csp, var)
-                self.nPrunings = self.nPrunings + len(prunings)
+                self.trail_prunings(prunings)
+                self.nPrunings = self.nPrunings + self.trail.top - self.trail.marks[-1]
+                if self.csp.prune_counts is not None:
+                    self.csp.prune_counts[(var, val)] = self.trail.top - self.trail.marks[-1]
 
                 if self.TRACE:
                     print('  ' * level, "bt_recurse prop status = ", status)
-                    print('  ' * level, "bt_recurse prop pruned = ", prunings)
+                    print('  ' * level, "bt_recurse prop pruned = ",
+                          self.trail.records(self.trail.marks[-1]))
 
                 if status:
                     if self.bt_recurse(propagator, var_ord,val_ord, level+1):
                         return True
+                elif self.monitor is not None:
+                    self.monitor.failure(level)
 
                 if self.TRACE:
-                    print('  ' * level, "bt_recurse restoring ", prunings)
-                self.restoreValues(prunings)
+                    print('  ' * level, "bt_recurse restoring ",
+                          self.trail.records(self.trail.marks[-1]))
+                self.trail.undo()
                 var.unassign()
+                if self.monitor is not None:
+                    self.monitor.backtrack(var, level)
 
             self.restoreUnasgnVar(var)
             return False
 
+    def bt_iterate(self, propagator, var_ord, val_ord):
+        '''Iterative version of bt_recurse. Return true if found
+           solution, false if there is no solution.'''
+        for solution in self.bt_walk(propagator, var_ord, val_ord):
+            return True
+        return False
+
+    def bt_walk(self, propagator, var_ord, val_ord):
+        '''Generator running the search of bt_iterate. It yields (True)
+           whenever every variable is assigned, i.e., at each solution,
+           and when resumed backtracks from that solution to look for
+           the next one. It ends when the search tree is exhausted.
+
+           The stack holds one frame [var, value_order, next value index]
+           per decision level; going down a level pushes a frame and
+           backtracking pops the trail and the frame instead of
+           returning from a recursive call.'''
+
+        stack = []
+        descend = True
+        while True:
+            if descend:
+                level = len(stack) + 1
+                if self.TRACE:
+                    print('  ' * level, "bt_iterate level ", level)
+
+                if not self.unasgn_vars:
+                    #all variables assigned
+                    if self.monitor is not None:
+                        self.monitor.solution()
+                    yield True
+                    if not stack:
+                        return
+                    #look for the next solution
+                    descend = False
+                    continue
+
+                if var_ord:
+                    var = var_ord(self.csp)
+                else:
+                    var = self.unasgn_vars[0]
+                self.unasgn_vars.remove(var)
+
+                if self.TRACE:
+                    print('  ' * level, "bt_iterate var = ", var)
+
+                if val_ord:
+                    value_order = val_ord(self.csp, var)
+                else:
+                    value_order = var.cur_domain()
+                frame = [var, value_order, 0]
+                stack.append(frame)
+            else:
+                #the value tried last at this level failed, undo it
+                frame = stack[-1]
+                var = frame[0]
+                level = len(stack)
+                if self.TRACE:
+                    print('  ' * level, "bt_iterate restoring ",
+                          self.trail.records(self.trail.marks[-1]))
+                self.trail.undo()
+                var.unassign()
+                if self.monitor is not None:
+                    self.monitor.backtrack(var, level)
+
+            var, value_order, i = frame
+            if i == len(value_order) or (self.stop is not None and self.should_stop()):
+                #no values left (or told to stop), backtrack to the
+                #previous level
+                stack.pop()
+                self.restoreUnasgnVar(var)
+                if not stack:
+                    return
+                descend = False
+                continue
+            frame[2] = i + 1
+            val = value_order[i]
+
+            if self.TRACE:
+                print('  ' * level, "bt_iterate trying", var, "=", val)
+
+            var.assign(val)
+            self.nDecisions = self.nDecisions+1
+            if self.monitor is not None:
+                self.monitor.decision(var, val, level)
+
+            self.trail.mark()
+            if self.csp.support_counts is not None:
+                self.csp.support_counts.clear()
+            status, prunings = propagator(self.csp, var)
+            self.trail_prunings(prunings)
+            self.nPrunings = self.nPrunings + self.trail.top - self.trail.marks[-1]
+            if self.csp.prune_counts is not None:
+                self.csp.prune_counts[(var, val)] = self.trail.top - self.trail.marks[-1]
+
+            if self.TRACE:
+                print('  ' * level, "bt_iterate prop status = ", status)
+                print('  ' * level, "bt_iterate prop pruned = ",
+                      self.trail.records(self.trail.marks[-1]))
+
+            descend = status
+            if not status and self.monitor is not None:
+                self.monitor.failure(level)
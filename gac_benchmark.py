@@ -0,0 +1,68 @@
+from cspbase import *
+from models import *
+from propagators import *
+import itertools
+
+'''
+Compare prop_GAC with prop_GAC_residual on the same boards by counting
+tuple checks (calls to Constraint.tuple_is_valid), decisions and CPU
+time. With residual supports a revision usually finds the support it
+found last time on its first tuple check. Both propagators prune the
+same values, so they make the same decisions.
+
+Run with: python gac_benchmark.py
+'''
+
+puzzles = [
+    "..3.2.6..9..3.5..1..18.64....81.29..7.......8..67.82....26.95..8..2.3..9..5.1.3..",
+    "...2...633....54.1..1..398........9....538....3........263..5..5.37....847...1...",
+]
+
+def to_grid(puzzle, N=9):
+    return [[0 if ch in '.0' else int(ch) for ch in puzzle[i * N:(i + 1) * N]]
+            for i in range(N)]
+
+def queens(n):
+    '''n-queens CSP (as in propagators_test.py)'''
+    dom = list(range(1, n + 1))
+    vars = [Variable('Q{}'.format(i), dom) for i in dom]
+    csp = CSP("{}-Queens".format(n), vars)
+    for qi, qj in itertools.combinations(range(n), 2):
+        con = Constraint("C(Q{},Q{})".format(qi + 1, qj + 1), [vars[qi], vars[qj]])
+        con.add_satisfying_tuples(t for t in itertools.product(dom, dom)
+                                  if t[0] != t[1] and abs(t[0] - t[1]) != abs(qi - qj))
+        csp.add_constraint(con)
+    return csp
+
+tuple_checks = 0
+tuple_is_valid = Constraint.tuple_is_valid
+
+def counting_tuple_is_valid(self, t):
+    global tuple_checks
+    tuple_checks += 1
+    return tuple_is_valid(self, t)
+
+def run(csp, propagator):
+    '''Solve csp, return the SearchResult and the number of tuple checks'''
+    global tuple_checks
+    tuple_checks = 0
+    Constraint.tuple_is_valid = counting_tuple_is_valid
+    try:
+        result = BT(csp).bt_search(propagator, iterative=True)
+    finally:
+        Constraint.tuple_is_valid = tuple_is_valid
+    return result, tuple_checks
+
+if __name__ == "__main__":
+    boards = [("sudoku" + str(n), lambda p=p: sudoku(to_grid(p))[0])
+              for n, p in enumerate(puzzles)]
+    boards += [("queens" + str(n), lambda n=n: queens(n)) for n in [8, 12, 16]]
+
+    print("{:>8} {:>18} {:>10} {:>12} {:>9}".format(
+        "board", "propagator", "decisions", "tuple checks", "cpu (s)"))
+    for name, build in boards:
+        for propagator in [prop_GAC, prop_GAC_residual]:
+            result, checks = run(build(), propagator)
+            print("{:>8} {:>18} {:>10} {:>12} {:>9.3f}".format(
+                name, propagator.__name__, result.decisions, checks,
+                result.cpu_time))
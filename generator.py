@@ -0,0 +1,135 @@
+'''Sudoku puzzle generator.
+
+A PuzzleGenerator builds the model of an empty grid once and reuses it
+for everything it does:
+
+    1. a full grid is found by search with a random value ordering;
+
+    2. its cells are taken out one at a time in random order. A cell can
+       go if the puzzle stays unique: with the cell unassigned and its
+       value pruned from its domain, the puzzle must have no solution.
+       Taking a clue out or putting it back only unassigns or assigns
+       its Variable; no constraint is rebuilt;
+
+    3. the resulting puzzle is rated by the decisions (or prunings) a
+       reference solver configuration needs to solve it, and kept if
+       the rating is in the requested range. Every blank takes one
+       decision, so the decisions of a puzzle with b blanks are b plus
+       the number of wrong guesses.
+
+For example
+
+    gen = PuzzleGenerator(seed=1)
+    puzzle, solution, rating = gen.generate(min_rating=60)
+'''
+
+import random
+
+import models
+from cspbase import BT
+from propagators import prop_GAC
+from heuristics import ord_mrv
+
+class PuzzleGenerator:
+    '''Generates puzzles with a unique solution for grids with boxes of
+       side B (9x9 by default).
+
+       propagator and var_ord are used to fill grids and to check
+       uniqueness; rate_propagator and rate_var_ord are the reference
+       configuration puzzles are rated with. model builds the CSP of a
+       grid (models.sudoku_nary_ad or models.sudoku).'''
+
+    def __init__(self, B=3, seed=None, model=models.sudoku_nary_ad,
+                 propagator=prop_GAC, var_ord=ord_mrv,
+                 rate_propagator=prop_GAC, rate_var_ord=None):
+        self.N = B * B
+        self.csp, self.var_array = model([[0] * self.N for i in range(self.N)])
+        self.solver = BT(self.csp)
+        self.rng = random.Random(seed)
+        self.propagator = propagator
+        self.var_ord = var_ord
+        self.rate_propagator = rate_propagator
+        self.rate_var_ord = rate_var_ord
+
+    def random_values(self, csp, var):
+        '''value ordering: the values of var in random order'''
+        vals = var.cur_domain()
+        self.rng.shuffle(vals)
+        return vals
+
+    def set_clues(self, grid):
+        '''Make grid (0 for a blank) the clues of the model'''
+        self.solver.undo_search()
+        for r, row in enumerate(self.var_array):
+            for c, var in enumerate(row):
+                if var.is_assigned():
+                    var.unassign()
+                if grid[r][c]:
+                    var.assign(grid[r][c])
+
+    def clues(self):
+        '''return the current clues as a grid (0 for a blank)'''
+        return [[var.get_assigned_value() or 0 for var in row] for row in self.var_array]
+
+    def full_grid(self):
+        '''return a random solved grid'''
+        self.set_clues([[0] * self.N for i in range(self.N)])
+        result = self.solver.bt_search(self.propagator, self.var_ord,
+                                       self.random_values, iterative=True)
+        grid = result.grid(self.var_array)
+        self.solver.undo_search()
+        return grid
+
+    def can_remove(self, var):
+        '''Return True if the clue of var can be taken out of the
+           current clues without the puzzle getting a second solution.
+           The clues are left as they were.'''
+        val = var.get_assigned_value()
+        var.unassign()
+        var.prune_value(val)
+        result = self.solver.bt_search(self.propagator, self.var_ord, iterative=True)
+        self.solver.undo_search()
+        var.unprune_value(val)
+        var.assign(val)
+        return not result.solved()
+
+    def rate(self, measure="decisions"):
+        '''Solve the current clues with the reference configuration and
+           return its number of decisions (or, with measure="prunings",
+           prunings)'''
+        result = self.solver.bt_search(self.rate_propagator, self.rate_var_ord,
+                                       iterative=True)
+        self.solver.undo_search()
+        if measure == "decisions":
+            return result.decisions
+        if measure == "prunings":
+            return result.prunings
+        raise ValueError("unknown rating measure {!r}".format(measure))
+
+    def make_puzzle(self, solution, max_rating=None, measure="decisions"):
+        '''Take clues out of the solved grid solution, in random order,
+           for as long as the solution stays unique (and, if max_rating
+           is given, the rating does not exceed it). Return the puzzle.'''
+        self.set_clues(solution)
+        cells = [var for row in self.var_array for var in row]
+        self.rng.shuffle(cells)
+        for var in cells:
+            if not self.can_remove(var):
+                continue
+            val = var.get_assigned_value()
+            var.unassign()
+            if max_rating is not None and self.rate(measure) > max_rating:
+                var.assign(val)
+        return self.clues()
+
+    def generate(self, min_rating=0, max_rating=None, measure="decisions", tries=100):
+        '''Generate a puzzle whose rating lies between min_rating and
+           max_rating. Return (puzzle, solution, rating), or None if no
+           puzzle in range was found in tries attempts.'''
+        for i in range(tries):
+            solution = self.full_grid()
+            puzzle = self.make_puzzle(solution, max_rating, measure)
+            rating = self.rate(measure)
+            if rating >= min_rating:
+                return puzzle, solution, rating
+        return None
@@ -0,0 +1,46 @@
+from cspbase import *
+from propagators import *
+from generator import PuzzleGenerator
+import models
+
+'''
+Checks of generator.PuzzleGenerator: every puzzle it makes has exactly
+one solution, the one it returns.
+Run with python generator_test.py (or pytest).
+'''
+
+def check_unique(puzzle, solution):
+    '''assert that puzzle has solution as its only solution, counted on
+       a model built afresh'''
+    csp, var_array = models.sudoku_nary_ad(puzzle)
+    solver = BT(csp)
+    assert solver.count_solutions(prop_GAC, limit=2) == 1
+    found = solver.bt_search(prop_GAC).grid(var_array)
+    assert found == solution
+    for r, row in enumerate(puzzle):
+        for c, val in enumerate(row):
+            assert not val or val == solution[r][c]
+
+def test_unique_4x4():
+    gen = PuzzleGenerator(B=2, seed=1)
+    for i in range(10):
+        puzzle, solution, rating = gen.generate()
+        check_unique(puzzle, solution)
+        assert rating >= sum(row.count(0) for row in puzzle)
+
+def test_unique_9x9():
+    gen = PuzzleGenerator(seed=7)
+    puzzle, solution, rating = gen.generate(max_rating=70)
+    check_unique(puzzle, solution)
+    assert rating <= 70
+    #the generator's own model is left with the puzzle's clues
+    assert gen.clues() == puzzle
+
+def test_seed():
+    first = PuzzleGenerator(B=2, seed=3).generate()
+    assert PuzzleGenerator(B=2, seed=3).generate() == first
+
+if __name__ == "__main__":
+    for test in [test_unique_4x4, test_unique_9x9, test_seed]:
+        test()
+        print(test.__name__, "passed")
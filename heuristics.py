@@ -0,0 +1,212 @@
+'''This file contains variable and value ordering heuristics to be used
+   within bt_search, i.e., functions with the templates
+
+    var_ord(csp)
+        ==> returns the next unassigned Variable of csp to assign
+
+    val_ord(csp, var)
+        ==> returns the list of values of var's current domain in the
+            order they should be tried
+
+1. ord_mrv
+    - minimum remaining values: a variable with the smallest current
+      domain.
+
+2. ord_mrv_deg
+    - minimum remaining values, ties broken in favour of the variable
+      involved in the most constraints with other unassigned variables.
+
+3. ord_dom_deg
+    - the variable minimizing current domain size / degree.
+
+4. ord_dom_wdeg
+    - the variable minimizing current domain size / weighted degree,
+      where a constraint's weight is bumped every time it causes a
+      dead end in a propagator (see c.weight in propagators.py).
+
+5. val_lcv
+    - least constraining value: values found to support the most
+      values of other variables by the propagation of the last
+      decision first (values it found no support for count as 0).
+
+6. val_min_conflicts
+    - values whose last trial made the propagator prune the fewest
+      values first (values not tried yet count as 0).
+
+Neither one simulates assigning each value. They reuse statistics
+gathered during search, which they switch on the first time they are
+called: the support counts the propagators keep since the last
+decision (the CSP's support_counts, see propagators.py) and the prune
+counts BT gathers (the CSP's prune_counts). val_lcv works best with the
+GAC propagators; prop_FC finds few supports to count.
+
+ord_mrv and ord_mrv_deg use a DomainSizeIndex of the unassigned
+variables by domain size, kept up to date by the CSP and BT, so they do
+not rescan every variable of the CSP at every decision.
+'''
+
+class DomainSizeIndex:
+    '''Buckets of the unassigned variables of a CSP by current domain
+       size, maintained incrementally.
+
+       update(var) is called whenever var's domain shrinks (by
+       CSP.prune_value) or var is returned to the unassigned variables
+       (by BT), and pushes var into the bucket of its current size.
+       Other changes are picked up lazily: bucket entries are checked
+       when they are looked at, and entries of variables that have
+       since been assigned or whose domain has grown back on backtrack
+       are dropped or moved to the right bucket. Selecting a variable
+       is therefore O(1) amortized.'''
+
+    def __init__(self, csp):
+        self.csp = csp
+        self.build()
+
+    def build(self):
+        '''(Re)build the buckets from the current state of the CSP'''
+        max_size = max([v.domain_size() for v in self.csp.vars] + [0])
+        self.buckets = [[] for s in range(max_size + 1)]
+        self.entries = 0
+        for v in self.csp.vars:
+            if not v.is_assigned():
+                self.buckets[v.cur_domain_size()].append(v)
+                self.entries += 1
+
+    def update(self, var):
+        '''Record that var's current domain size may have changed'''
+        if var.is_assigned():
+            return
+        self.buckets[var.cur_domain_size()].append(var)
+        self.entries += 1
+        if self.entries > 8 * len(self.csp.vars) + 64:
+            #too many stale entries have piled up
+            self.build()
+
+    def bucket(self, size):
+        '''Clean bucket size and return it, lazily moving or dropping
+           the entries that are no longer right'''
+        bucket = self.buckets[size]
+        while bucket:
+            var = bucket[-1]
+            if not var.is_assigned() and var.cur_domain_size() == size:
+                break
+            bucket.pop()
+            self.entries -= 1
+            if not var.is_assigned() and var.cur_domain_size() > size:
+                self.buckets[var.cur_domain_size()].append(var)
+                self.entries += 1
+        return bucket
+
+    def min_size(self):
+        '''return the size of the smallest nonempty bucket (None if
+           every variable is assigned)'''
+        for size in range(len(self.buckets)):
+            if self.bucket(size):
+                return size
+        return None
+
+    def first(self):
+        '''return an unassigned variable with the smallest current domain'''
+        size = self.min_size()
+        if size is None:
+            return None
+        return self.buckets[size][-1]
+
+    def smallest(self):
+        '''return list of all unassigned variables with the smallest
+           current domain'''
+        size = self.min_size()
+        if size is None:
+            return []
+        vars = []
+        seen = set()
+        for var in self.buckets[size]:
+            if (not var in seen and not var.is_assigned()
+                    and var.cur_domain_size() == size):
+                seen.add(var)
+                vars.append(var)
+        return vars
+
+def size_index(csp):
+    '''return the DomainSizeIndex of csp, creating it if needed'''
+    if csp.size_index is None:
+        csp.size_index = DomainSizeIndex(csp)
+    return csp.size_index
+
+def degree(csp, var):
+    '''number of constraints on var with another unassigned variable'''
+    n = 0
+    for c in csp.vars_to_cons[var]:
+        for v in c.scope:
+            if v is not var and not v.is_assigned():
+                n += 1
+                break
+    return n
+
+def weighted_degree(csp, var):
+    '''sum of the weights of the constraints on var with another
+       unassigned variable'''
+    w = 0
+    for c in csp.vars_to_cons[var]:
+        for v in c.scope:
+            if v is not var and not v.is_assigned():
+                w += c.weight
+                break
+    return w
+
+def ord_mrv(csp):
+    '''a variable with the minimum remaining values'''
+    return size_index(csp).first()
+
+def ord_mrv_deg(csp):
+    '''minimum remaining values, ties broken by the largest degree'''
+    vars = size_index(csp).smallest()
+    if len(vars) == 1:
+        return vars[0]
+    best = None
+    best_deg = -1
+    for var in vars:
+        d = degree(csp, var)
+        if d > best_deg:
+            best = var
+            best_deg = d
+    return best
+
+def ord_dom_deg(csp):
+    '''the variable with the smallest domain size / degree'''
+    best = None
+    best_score = None
+    for var in csp.get_all_unasgn_vars():
+        score = var.cur_domain_size() / max(degree(csp, var), 1)
+        if best is None or score < best_score:
+            best = var
+            best_score = score
+    return best
+
+def ord_dom_wdeg(csp):
+    '''the variable with the smallest domain size / weighted degree.
+       Weights change at every dead end, so unlike ord_mrv this scans
+       every unassigned variable.'''
+    best = None
+    best_score = None
+    for var in csp.get_all_unasgn_vars():
+        score = var.cur_domain_size() / max(weighted_degree(csp, var), 1)
+        if best is None or score < best_score:
+            best = var
+            best_score = score
+    return best
+
+def val_lcv(csp, var):
+    '''least constraining value first: the values supporting the most
+       values of other variables in the last propagation come first'''
+    if csp.support_counts is None:
+        csp.support_counts = dict()
+    counts = csp.support_counts
+    return sorted(var.cur_domain(), key=lambda val: -counts.get((var, val), 0))
+
+def val_min_conflicts(csp, var):
+    '''values that caused the fewest prunings when last tried first'''
+    if csp.prune_counts is None:
+        csp.prune_counts = dict()
+    counts = csp.prune_counts
+    return sorted(var.cur_domain(), key=lambda val: counts.get((var, val), 0))
@@ -58,13 +58,13 @@ if __name__ == "__main__":
     solver = BT(csp)
     # solver.trace_on()
     print("Back-Tracking Search (w/o constraint propagation)")
-    solver.bt_search(prop_BT)
+    solver.bt_search(prop_BT, verbose=True)
 
     print("Back-Tracking Search (w/ forward checking)")
-    solver.bt_search(prop_FC)
+    solver.bt_search(prop_FC, verbose=True)
 
     print("Back-Tracking Search (w/ generalized arc-consistency)")
-    solver.bt_search(prop_GAC)
+    solver.bt_search(prop_GAC, verbose=True)
 
     print("Solution:")
     for row in var_array:
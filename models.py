@@ -29,67 +29,238 @@ The grid-only models do not need to encode the cage constraints.
 '''
 from cspbase import *
 import itertools
+import functools
 
-def sudoku(grid):
-    N = 9
+@functools.lru_cache(maxsize=None)
+def ne_relation(N):
+    '''Binary not-equal relation over the values 1..N. It is built once
+       and shared by every not-equal constraint of every model using it.'''
+    return Relation(2, itertools.permutations(range(1, N + 1), 2))
+
+def box_size(N):
+    '''return B such that N = B*B (the side of a box of an N x N grid)'''
+    B = int(round(N ** 0.5))
+    if B * B != N:
+        raise ValueError("grid side {} is not a perfect square".format(N))
+    return B
+
+def sudoku_vars(csp, grid):
+    '''Add one Variable per cell of the N x N grid (N = B*B) to csp,
+       assigning the clues (the entries in 1..N), and return
+       (var_array, blocks): the Variables by row and by box.
+
+       Cells are named row and column (from 1) run together, e.g. "47",
+       up to 9x9; in larger grids that would be ambiguous ("111" could
+       be row 1, column 11 or row 11, column 1), so "_" separates them,
+       e.g. "11_1".'''
+    N = len(grid)
+    B = box_size(N)
+    sep = "" if N < 10 else "_"
     dom_V = range(1, N + 1)
     var_array = []
-    csp = CSP("Sudoku_CSP")
-    tuples = list(itertools.permutations(range(1, N + 1), 2))
     blocks = [[] for x in range(N)]
     for Y in range(1, N+1):
-        ver_pos = (Y-1) // 3
+        ver_pos = (Y-1) // B
         row = []
         for X in range(1, N+1):
-            hor_pos = (X-1) // 3
-            block_num = ver_pos * 3 + hor_pos
-            var = Variable(str(Y) + str(X), dom_V)
+            hor_pos = (X-1) // B
+            block_num = ver_pos * B + hor_pos
+            var = Variable(str(Y) + sep + str(X), dom_V)
             if grid[Y-1][X-1] in dom_V:
                 var.assign(grid[Y-1][X-1])
             row.append(var)
             csp.add_var(var)
             blocks[block_num].append(var)
         var_array.append(row)
+    return var_array, blocks
+
+def sudoku(grid):
+    '''Sudoku model using a binary not-equal constraint between every
+       two cells of a row, column or block, for an N x N grid with
+       blocks of side B = sqrt(N) (so 9x9, 16x16, 25x25, ... grids
+       work). Pairs of cells of a block that share a row or
+       column get no second constraint. All constraints share one
+       not-equal relation, but there are still O(N^3) of them (810 for
+       9x9, about 20000 for 25x25): sudoku_nary_ad has 3N.'''
+    csp = CSP("Sudoku_CSP")
+    var_array, blocks = sudoku_vars(csp, grid)
+    N = len(var_array)
+    B = box_size(N)
+    sep = "" if N < 10 else "_"
+    ne = ne_relation(N)
 
     for i1 in range(N):
         for j1 in range(N):
             var1 = var_array[i1][j1]
             for j2 in range(j1 + 1, N):
                 var2 = var_array[i1][j2] #var2 is on the right of var1
-                con = Constraint("R{}_{}{}".format(i1 + 1, j1 + 1, j2+ 1), [var1, var2])
-                con.add_satisfying_tuples(tuples)
+                con = Constraint("R{}_{}{}{}".format(i1 + 1, j1 + 1, sep, j2 + 1), [var1, var2], ne)
                 csp.add_constraint(con)
             for i2 in range(i1 + 1, N):
                 var2 = var_array[i2][j1] #var2 is on the bottom of var1
-                con = Constraint("C{}_{}{}".format(j1 + 1, i1 + 1, i2+ 1), [var1, var2])
-                con.add_satisfying_tuples(tuples)
+                con = Constraint("C{}_{}{}{}".format(j1 + 1, i1 + 1, sep, i2 + 1), [var1, var2], ne)
                 csp.add_constraint(con)
-            ver_pos_in_block = i1 % 3
-            hor_pos_in_block = j1 % 3
-            if ver_pos_in_block == 2:
-                continue
-            if hor_pos_in_block == 0:
-                indices_not_in_col = [j1 + 1, j1 + 2]
-            elif hor_pos_in_block == 1:
-                indices_not_in_col = [j1 + 1, j1 - 1]
-            else:
-                indices_not_in_col = [j1 - 1, j1 - 2]
-            if ver_pos_in_block < 2:
-                var3 = var_array[i1 + 1][indices_not_in_col[0]]
-                var4 = var_array[i1 + 1][indices_not_in_col[1]]
-                block_con1 = Constraint("B{}{}_{}{}_{}{}".format(i1//3, j1//3, i1, j1, i1+1, indices_not_in_col[0]), [var1, var3])
-                block_con2 = Constraint("B{}{}_{}{}_{}{}".format(i1//3, j1//3, i1, j1, i1+1, indices_not_in_col[1]), [var1, var4])
-                block_con1.add_satisfying_tuples(tuples)
-                block_con2.add_satisfying_tuples(tuples)
-                csp.add_constraint(block_con1)
-                csp.add_constraint(block_con2)
-            if ver_pos_in_block == 0:
-                var3 = var_array[i1 + 2][indices_not_in_col[0]]
-                var4 = var_array[i1 + 2][indices_not_in_col[1]]
-                block_con1 = Constraint("B{}{}_{}{}_{}{}".format(i1//3, j1//3, i1, j1, i1+2, indices_not_in_col[0]), [var1, var3])
-                block_con2 = Constraint("B{}{}_{}{}_{}{}".format(i1//3, j1//3, i1, j1, i1+2, indices_not_in_col[1]), [var1, var4])
-                block_con1.add_satisfying_tuples(tuples)
-                block_con2.add_satisfying_tuples(tuples)
-                csp.add_constraint(block_con1)
-                csp.add_constraint(block_con2)
+            #cells further down in var1's block, in the other columns
+            #of the block (the rest are covered by the row and column
+            #constraints)
+            first_col = j1 - j1 % B
+            for i2 in range(i1 + 1, i1 - i1 % B + B):
+                for j2 in range(first_col, first_col + B):
+                    if j2 == j1:
+                        continue
+                    var2 = var_array[i2][j2]
+                    con = Constraint("B{}{s}{}_{}{s}{}_{}{s}{}".format(
+                        i1 // B, j1 // B, i1, j1, i2, j2, s=sep), [var1, var2], ne)
+                    csp.add_constraint(con)
+    return csp, var_array
+
+def sudoku_nary_ad(grid):
+    '''Sudoku model using one n-ary all-different constraint for each
+       row, column and block (27 constraints for a 9x9 grid) instead
+       of pairwise not-equal constraints. With prop_GAC the
+       all-different filter also finds hidden singles and naked
+       pairs/triples, so most puzzles need little or no search. Like
+       sudoku, it takes N x N grids with blocks of side B = sqrt(N).'''
+    csp = CSP("Sudoku_AD_CSP")
+    var_array, blocks = sudoku_vars(csp, grid)
+    N = len(var_array)
+    B = box_size(N)
+    sep = "" if N < 10 else "_"
+
+    for i in range(N):
+        csp.add_constraint(AllDiffConstraint("R{}".format(i + 1), var_array[i]))
+        csp.add_constraint(AllDiffConstraint("C{}".format(i + 1),
+                                             [row[i] for row in var_array]))
+        csp.add_constraint(AllDiffConstraint("B{}{}{}".format(i // B, sep, i % B), blocks[i]))
+    return csp, var_array
+
+def solve_sudoku(grid, engine="csp", propagator=None, var_ord=None, val_ord=None):
+    '''Solve a sudoku grid with the chosen engine and return
+       (SearchResult, var_array), var_array holding the solution.
+
+       engine == "csp"   : build models.sudoku_nary_ad and run BT with
+                           propagator (prop_GAC by default), var_ord
+                           and val_ord
+       engine == "numpy" : the vectorized engine of sudoku_np (needs
+                           NumPy); var_array then holds Cells, which
+                           also answer get_assigned_value()'''
+    if engine == "numpy":
+        import sudoku_np
+        return sudoku_np.solve(grid)
+    if engine != "csp":
+        raise ValueError("unknown sudoku engine {!r}".format(engine))
+    if propagator is None:
+        from propagators import prop_GAC
+        propagator = prop_GAC
+    csp, var_array = sudoku_nary_ad(grid)
+    result = BT(csp).bt_search(propagator, var_ord, val_ord, iterative=True)
+    return result, var_array
+
+#Cage operation of each op code of a warehouse board. Every board of the
+#drivers has op 0 on single cells only (the cell's value) and only solves
+#with 2 read as the smallest and 3 as the largest value of the room;
+#boards using KenKen style codes can pass their own table, e.g.,
+#{0: "sum", 1: "difference", 2: "division", 3: "product"}.
+WAREHOUSE_OPS = {0: "sum", 1: "sum", 2: "min", 3: "max"}
+
+def warehouse_vars(csp, board):
+    '''Add one Variable per cell of the warehouse board to csp and
+       return var_array, the Variables by row. board[0] is [N]; cells
+       are named row and column (from 1) run together, as the rooms of
+       the board refer to them, e.g. 47.'''
+    N = board[0][0]
+    if not 1 <= N <= 9:
+        raise ValueError("a warehouse side must be in 1..9, not {}".format(N))
+    var_array = []
+    for i in range(N):
+        row = []
+        for j in range(N):
+            var = Variable("{}{}".format(i + 1, j + 1), list(range(1, N + 1)))
+            csp.add_var(var)
+            row.append(var)
+        var_array.append(row)
+    return var_array
+
+def warehouse_binary_ne_grid(board):
+    '''Warehouse grid model (no rooms) with one binary not-equal
+       constraint for each pair of cells in a row or a column'''
+    csp = CSP("Warehouse_NE_CSP")
+    var_array = warehouse_vars(csp, board)
+    N = len(var_array)
+    ne = ne_relation(N)
+    for i1 in range(N):
+        for j1 in range(N):
+            for j2 in range(j1 + 1, N):
+                csp.add_constraint(Constraint("R{}_{}{}".format(i1 + 1, j1 + 1, j2 + 1),
+                                              [var_array[i1][j1], var_array[i1][j2]], ne))
+            for i2 in range(i1 + 1, N):
+                csp.add_constraint(Constraint("C{}_{}{}".format(j1 + 1, i1 + 1, i2 + 1),
+                                              [var_array[i1][j1], var_array[i2][j1]], ne))
+    return csp, var_array
+
+def warehouse_nary_ad_grid(board):
+    '''Warehouse grid model (no rooms) with one n-ary all-different
+       constraint for each row and column'''
+    csp = CSP("Warehouse_AD_CSP")
+    var_array = warehouse_vars(csp, board)
+    for i in range(len(var_array)):
+        csp.add_constraint(AllDiffConstraint("R{}".format(i + 1), var_array[i]))
+        csp.add_constraint(AllDiffConstraint("C{}".format(i + 1),
+                                             [row[i] for row in var_array]))
     return csp, var_array
+
+def warehouse_full_model(board, ops=None, grid=None):
+    '''Warehouse model: a grid model plus one CageConstraint per room.
+       A room [cell, ..., cell, op, target] lists its cells as
+       row * 10 + column (from 1); ops maps its op code to the cage
+       operation (WAREHOUSE_OPS by default).
+
+       grid builds the row/column constraints: warehouse_binary_ne_grid
+       (the default) or warehouse_nary_ad_grid. prop_FC only prunes
+       with an n-ary constraint once a single variable of it is left,
+       so it needs the binary constraints: it solves the 5x5 boards of
+       the drivers in 3-9 s with them and not within 15 s without.
+       prop_GAC wants the all-different ones, with ord_dom_wdeg, on the
+       larger boards: on the 8x8 board of the drivers that takes about
+       2 s, and it is the only configuration found to solve it within
+       15 s (the binary grid needs 13 s with prop_GAC and ord_dom_wdeg).
+       solve_warehouse uses that configuration by default.'''
+    if ops is None:
+        ops = WAREHOUSE_OPS
+    if grid is None:
+        grid = warehouse_binary_ne_grid
+    csp, var_array = grid(board)
+    N = len(var_array)
+    for room in board[1:]:
+        cells, op, target = room[:-2], room[-2], room[-1]
+        if not op in ops:
+            raise ValueError("unknown room op code {} in {}".format(op, room))
+        scope = []
+        for cell in cells:
+            i, j = divmod(cell, 10)
+            if not (1 <= i <= N and 1 <= j <= N):
+                raise ValueError("room cell {} is outside the {}x{} board".format(cell, N, N))
+            scope.append(var_array[i - 1][j - 1])
+        name = "Room_{}".format("_".join(str(cell) for cell in cells))
+        csp.add_constraint(CageConstraint(name, scope, ops[op], target))
+    return csp, var_array
+
+def solve_warehouse(board, propagator=None, var_ord=None, val_ord=None, ops=None,
+                    grid=None):
+    '''Solve a warehouse board and return (SearchResult, var_array),
+       var_array holding the solution. By default the full model is
+       built on warehouse_nary_ad_grid and searched by BT with prop_GAC
+       and ord_dom_wdeg, the fastest configuration on the larger boards
+       (see warehouse_full_model); ops and grid are passed on to
+       warehouse_full_model.'''
+    if propagator is None:
+        from propagators import prop_GAC
+        propagator = prop_GAC
+    if var_ord is None:
+        from heuristics import ord_dom_wdeg
+        var_ord = ord_dom_wdeg
+    if grid is None:
+        grid = warehouse_nary_ad_grid
+    csp, var_array = warehouse_full_model(board, ops, grid)
+    result = BT(csp).bt_search(propagator, var_ord, val_ord, iterative=True)
+    return result, var_array
@@ -53,7 +53,7 @@ if __name__ == "__main__":
         csp, var_array = warehouse_binary_ne_grid(b)
         solver = BT(csp)
         print("\n")
-        solver.bt_search(prop_BT)
+        solver.bt_search(prop_BT, verbose=True)
         print("Solution:")
 
         for row in var_array:
@@ -67,7 +67,7 @@ if __name__ == "__main__":
         csp, var_array = warehouse_nary_ad_grid(b)
         solver = BT(csp)
         print("\n")
-        solver.bt_search(prop_BT)
+        solver.bt_search(prop_BT, verbose=True)
         print("Solution:")
 
         for row in var_array:
@@ -85,10 +85,10 @@ if __name__ == "__main__":
         # solver.bt_search(prop_BT)
 
         print("Back-Tracking Search (w/ forward checking)")
-        solver.bt_search(prop_FC)
+        solver.bt_search(prop_FC, verbose=True)
 
         print("Back-Tracking Search (w/ generalized arc-consistency)")
-        solver.bt_search(prop_GAC)
+        solver.bt_search(prop_GAC, verbose=True)
 
         print("Solution:")
 
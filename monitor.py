@@ -0,0 +1,257 @@
+'''Instrumentation of BT searches.
+
+A Monitor attached to a BT solver counts what the search does and calls
+optional event callbacks:
+
+    on_decision(var, val, level)   a variable was assigned
+    on_prune(var, val)             a value was pruned
+    on_backtrack(var, level)       an assignment was undone
+    on_solution()                  every variable is assigned
+
+Counters kept: decisions, prunings, backtracks, solutions, failures (a
+propagator found a dead end) per level, revisions (constraints popped
+from a GAC queue), queue pushes (constraints actually queued, not the
+pushes of constraints queued already), support checks (one per value a
+propagator looks for a support of, however many of has_support,
+find_support and residual_support that takes), tuple checks
+(tuple_is_valid calls), and the calls and time of each propagator.
+
+Nothing is instrumented unless a monitor is attached: BT only tests
+whether it has a monitor at each decision, and the hot paths (pruning,
+support checks, the GAC queue) are wrapped by attach() and unwrapped by
+detach(). The GAC queue and propagators.residual_support are wrapped at
+class and module level, counting only during the monitored solver's
+propagator calls; attach only one monitor at a time. For example
+
+    with Monitor().attached(solver) as m:
+        solver.bt_search(prop_GAC)
+    m.write(open("stats.jsonl", "a"))
+
+If log is a file, every event is also written to it as a JSON line.
+'''
+
+import json
+import time
+import types
+import contextlib
+
+import propagators
+from propagators import GACQueue
+
+class Monitor:
+    '''Counters and event callbacks for the searches of one BT solver'''
+
+    def __init__(self, on_decision=None, on_prune=None, on_backtrack=None,
+                 on_solution=None, log=None):
+        self.on_decision = on_decision
+        self.on_prune = on_prune
+        self.on_backtrack = on_backtrack
+        self.on_solution = on_solution
+        self.log = log
+        self.solver = None
+        self.patched = []       #(object, attribute name, original or None)
+        self.checking = False   #inside a counted support check
+        self.running = False    #inside a propagator call of the solver
+        self.clear()
+
+    def clear(self):
+        '''Reset all counters'''
+        self.counters = {"decisions": 0, "prunings": 0, "backtracks": 0,
+                         "solutions": 0, "revisions": 0, "queue_pushes": 0,
+                         "support_checks": 0, "tuple_checks": 0}
+        self.failures = dict()          #level -> dead ends at that level
+        self.prop_calls = dict()        #propagator name -> calls
+        self.prop_time = dict()         #propagator name -> seconds
+
+    def event(self, name, **fields):
+        '''write an event to the log'''
+        fields["event"] = name
+        self.log.write(json.dumps(fields) + "\n")
+
+    #
+    #events, called by BT and by the wrapped hot paths
+    #
+
+    def decision(self, var, val, level):
+        self.counters["decisions"] += 1
+        if self.on_decision is not None:
+            self.on_decision(var, val, level)
+        if self.log is not None:
+            self.event("decision", var=var.name, val=val, level=level)
+
+    def prune(self, var, val):
+        self.counters["prunings"] += 1
+        if self.on_prune is not None:
+            self.on_prune(var, val)
+        if self.log is not None:
+            self.event("prune", var=var.name, val=val)
+
+    def failure(self, level):
+        self.failures[level] = self.failures.get(level, 0) + 1
+
+    def backtrack(self, var, level):
+        self.counters["backtracks"] += 1
+        if self.on_backtrack is not None:
+            self.on_backtrack(var, level)
+        if self.log is not None:
+            self.event("backtrack", var=var.name, level=level)
+
+    def solution(self):
+        self.counters["solutions"] += 1
+        if self.on_solution is not None:
+            self.on_solution()
+        if self.log is not None:
+            self.event("solution")
+
+    def timed(self, propagator):
+        '''return propagator wrapped to record its calls and time'''
+        #functools.partial objects (e.g., prop_GAC with priority=True)
+        #have no name of their own
+        name = getattr(propagator, "func", propagator).__name__
+        def timed_propagator(csp, newVar=None):
+            start = time.perf_counter()
+            self.running = True
+            try:
+                return propagator(csp, newVar)
+            finally:
+                self.running = False
+                self.prop_time[name] = self.prop_time.get(name, 0.0) + time.perf_counter() - start
+                self.prop_calls[name] = self.prop_calls.get(name, 0) + 1
+        timed_propagator.__name__ = name
+        return timed_propagator
+
+    #
+    #attaching
+    #
+
+    def patch(self, obj, attr, wrapper):
+        '''Replace obj.attr by wrapper(obj.attr), remembering how to undo
+           it. Instances get an attribute shadowing the method, which
+           detach deletes again; classes and modules get the original
+           back.'''
+        shared = isinstance(obj, (type, types.ModuleType))
+        original = obj.__dict__.get(attr) if shared else None
+        setattr(obj, attr, wrapper(getattr(obj, attr)))
+        self.patched.append((obj, attr, original))
+
+    def counting(self, counter):
+        '''wrapper factory: count the calls of a function in counter'''
+        counters = self.counters
+        def wrapper(f):
+            def counted(*args):
+                counters[counter] += 1
+                return f(*args)
+            return counted
+        return wrapper
+
+    def scoped(self, wrapper):
+        '''wrapper factory: wrapper(f) while a propagator of the
+           monitored solver runs, f itself at any other time'''
+        monitor = self
+        def scoped_wrapper(f):
+            counted = wrapper(f)
+            def call(*args):
+                if monitor.running:
+                    return counted(*args)
+                return f(*args)
+            return call
+        return scoped_wrapper
+
+    def checking_support(self, f):
+        '''wrapper: count a support check, unless f is called from
+           within one already (e.g., has_support calling find_support)'''
+        counters = self.counters
+        monitor = self
+        def counted(*args):
+            if monitor.checking:
+                return f(*args)
+            counters["support_checks"] += 1
+            monitor.checking = True
+            try:
+                return f(*args)
+            finally:
+                monitor.checking = False
+        return counted
+
+    def pushing(self, push):
+        '''wrapper of GACQueue.push: count the constraints it queues'''
+        counters = self.counters
+        def counted(Q, c):
+            if not c in Q.queued:
+                counters["queue_pushes"] += 1
+            return push(Q, c)
+        return counted
+
+    def attach(self, solver):
+        '''Instrument solver (a BT object) and its CSP.
+
+           The CSP and its constraints get instance attributes wrapping
+           prune_value, has_support, find_support and tuple_is_valid
+           (template.ModelTemplate.clone leaves them out of its copies).
+           GACQueue.push and pop and propagators.residual_support are
+           shared by the whole process, so they are wrapped in place
+           until detach, but count only while a propagator of solver is
+           running: other solvers are not counted unless they run inside
+           it (e.g., in another thread).'''
+        if self.solver is not None:
+            self.detach()
+        self.solver = solver
+        solver.monitor = self
+        csp = solver.csp
+        monitor = self
+        def pruning(prune_value):
+            def prune(var, val):
+                prune_value(var, val)
+                monitor.prune(var, val)
+            return prune
+        self.patch(csp, "prune_value", pruning)
+        for c in csp.get_all_cons():
+            self.patch(c, "has_support", self.checking_support)
+            self.patch(c, "find_support", self.checking_support)
+            self.patch(c, "tuple_is_valid", self.counting("tuple_checks"))
+        self.patch(propagators, "residual_support", self.scoped(self.checking_support))
+        self.patch(GACQueue, "push", self.scoped(self.pushing))
+        self.patch(GACQueue, "pop", self.scoped(self.counting("revisions")))
+        return self
+
+    def detach(self):
+        '''Undo attach'''
+        for obj, attr, original in reversed(self.patched):
+            if isinstance(obj, (type, types.ModuleType)):
+                setattr(obj, attr, original)
+            else:
+                delattr(obj, attr)
+        self.patched = []
+        if self.solver is not None:
+            self.solver.monitor = None
+            self.solver = None
+
+    @contextlib.contextmanager
+    def attached(self, solver):
+        '''context manager attaching the monitor to solver for the
+           duration of the block'''
+        self.attach(solver)
+        try:
+            yield self
+        finally:
+            self.detach()
+
+    #
+    #export
+    #
+
+    def as_dict(self):
+        '''return the counters as a plain dict'''
+        stats = dict(self.counters)
+        stats["failures_per_level"] = {str(level): n for level, n in sorted(self.failures.items())}
+        stats["propagators"] = {name: {"calls": self.prop_calls[name],
+                                       "time": self.prop_time[name]}
+                                for name in self.prop_calls}
+        return stats
+
+    def write(self, f, **fields):
+        '''Write the counters to the file f as one JSON line, together
+           with any extra fields (e.g. the name of the puzzle)'''
+        stats = self.as_dict()
+        stats.update(fields)
+        f.write(json.dumps(stats) + "\n")
@@ -0,0 +1,87 @@
+from cspbase import *
+from propagators import *
+from monitor import Monitor
+from template import ModelTemplate
+import functools
+import itertools
+import models
+import propagators
+
+'''
+Checks of the counters kept by monitor.Monitor on small instances.
+Run with python monitor_test.py (or pytest).
+'''
+
+def nQueens(n):
+    '''Return an n-queens CSP with binary table constraints'''
+    dom = list(range(1, n + 1))
+    vars = [Variable('Q{}'.format(i), dom) for i in dom]
+    csp = CSP("{}-Queens".format(n), vars)
+    for qi, qj in itertools.combinations(range(n), 2):
+        con = Constraint("C(Q{},Q{})".format(qi + 1, qj + 1), [vars[qi], vars[qj]])
+        con.add_satisfying_tuples([(i, j) for i, j in itertools.product(dom, dom)
+                                   if i != j and abs(i - j) != abs(qi - qj)])
+        csp.add_constraint(con)
+    return csp
+
+def test_fc_counters():
+    #prop_FC makes one has_support call per value checked; the
+    #find_support call it makes is part of that check
+    solver = BT(nQueens(6))
+    with Monitor().attached(solver) as m:
+        result = solver.bt_search(prop_FC)
+    assert m.counters == {"decisions": 46, "prunings": 132, "backtracks": 40,
+                          "solutions": 1, "revisions": 0, "queue_pushes": 0,
+                          "support_checks": 311, "tuple_checks": 904}
+    assert result.decisions == 46 and result.prunings == 132
+
+def test_residual_gac_counters():
+    #support checks of prop_GAC_residual go through residual_support;
+    #without a dead end every constraint queued is revised once
+    grid = [[0] * 4 for i in range(4)]
+    grid[0][0] = 1
+    csp, var_array = models.sudoku(grid)
+    solver = BT(csp)
+    with Monitor().attached(solver) as m:
+        solver.bt_search(prop_GAC_residual)
+    assert m.counters == {"decisions": 15, "prunings": 38, "backtracks": 0,
+                          "solutions": 1, "revisions": 305, "queue_pushes": 305,
+                          "support_checks": 1232, "tuple_checks": 1590}
+    assert m.prop_calls == {"prop_GAC_residual": 16}
+
+def test_partial_propagator():
+    solver = BT(nQueens(6))
+    with Monitor().attached(solver) as m:
+        result = solver.bt_search(functools.partial(prop_GAC, priority=True))
+    assert result.solved() and list(m.prop_calls) == ["prop_GAC"]
+    assert m.counters["decisions"] == result.decisions
+
+def test_other_solvers_not_counted():
+    #the queue and residual_support are wrapped for the whole process,
+    #but only the monitored solver's propagator calls are counted
+    tmpl = ModelTemplate(4, models.sudoku)
+    csp, var_array = tmpl.instance([[0] * 4 for i in range(4)])
+    solver = BT(csp)
+    with Monitor().attached(solver) as m:
+        solver.bt_search(prop_GAC_residual)
+        counters = dict(m.counters)
+        BT(nQueens(6)).bt_search(prop_GAC_residual)
+        clone, clone_array = tmpl.clone()
+        BT(clone).bt_search(prop_GAC_residual)
+        assert m.counters == counters
+        assert not "prune_value" in vars(clone)
+
+def test_detach():
+    solver = BT(nQueens(4))
+    with Monitor().attached(solver):
+        pass
+    assert propagators.residual_support is residual_support
+    assert GACQueue.push.__name__ == "push"
+    assert all(not "has_support" in vars(c) for c in solver.csp.cons)
+    assert solver.monitor is None
+
+if __name__ == "__main__":
+    for test in [test_fc_counters, test_residual_gac_counters, test_partial_propagator,
+                 test_other_solvers_not_counted, test_detach]:
+        test()
+        print(test.__name__, "passed")
@@ -0,0 +1,398 @@
+'''Parallel drivers for the sudoku solvers of models.py.
+
+solve_batch(grids, ...) solves a stream of grids on a pool of worker
+processes (concurrent.futures). Only the grids (lists of lists of ints)
+and the solver configuration are sent to the workers; each worker
+builds its own model with models.solve_sudoku, so no Variable or
+Constraint object is ever pickled. The propagator and orderings are
+sent by reference, so they must be module level functions (e.g. from
+propagators.py or heuristics.py), not lambdas.
+
+The grids are sent in chunks. Unless a chunk size is given, the first
+chunks hold a single grid; once some chunks have come back, chunks are
+sized to take about CHUNK_TIME seconds each, judged by the time the
+solved grids took so far. Batches smaller than min_parallel grids (or
+workers=1) are solved in the calling process, where starting a pool
+would cost more than it saves.
+
+solve_split(grid, ...) uses the workers on a single hard grid instead.
+The search tree is split at its first levels into open subtrees, each
+described by a prefix: a tuple of (row, col, value) decisions. A worker
+re-creates the state of its subtree by building the model of the grid
+with the prefix filled in as extra clues, and searches it with BT. As
+soon as one worker finds a solution the others are told to stop (via
+BT.stop) and the subtrees not started yet are cancelled.
+
+solve_portfolio(board, ...) races several solver configurations
+(propagator, var_ord, val_ord) on the same board, each in its own
+process, returns the first result to come back and terminates the other
+processes. The winning configuration is returned, and can be appended
+to a JSON-lines log to tune the default configuration from real boards.
+'''
+
+import os
+import time
+import json
+import queue
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import models
+from cspbase import BT, SearchResult
+from propagators import prop_GAC, prop_GAC_residual
+from heuristics import ord_mrv, ord_mrv_deg, ord_dom_wdeg, val_lcv, val_min_conflicts
+
+CHUNK_TIME = 0.25       #seconds of solving per chunk sent to a worker
+MAX_CHUNK = 256         #largest number of grids in a chunk
+
+#configurations (propagator, var_ord, val_ord) raced by solve_portfolio.
+#prop_FC is left out: on sudoku_nary_ad it only revises an all-different
+#constraint once a single variable of it is left, and cannot solve hard
+#boards in any reasonable time.
+PORTFOLIO = [(prop_GAC, ord_mrv, val_min_conflicts),
+             (prop_GAC, None, None),
+             (prop_GAC, ord_dom_wdeg, None),
+             (prop_GAC_residual, ord_mrv_deg, val_lcv)]
+
+class BatchResult:
+    '''Outcome of solve_batch.
+
+       solutions   == list of the solved grids (lists of lists of
+                      values) in input order, None for a grid without
+                      solution
+       results     == list of the SearchResults of the grids, in input
+                      order (their assignment is left empty; the values
+                      are in solutions)
+       workers     == number of worker processes used (0 if the batch
+                      was solved in the calling process)
+       wall_time   == elapsed wall-clock seconds for the whole batch
+       cpu_time    == CPU seconds used by all the searches'''
+
+    def __init__(self, solutions, results, workers, wall_time):
+        self.solutions = solutions
+        self.results = results
+        self.workers = workers
+        self.wall_time = wall_time
+        self.cpu_time = sum(r.cpu_time for r in results)
+
+    def __len__(self):
+        return len(self.results)
+
+    def n_solved(self):
+        '''return the number of grids that were solved'''
+        return sum(1 for r in self.results if r.solved())
+
+    def throughput(self):
+        '''return the number of grids solved per wall-clock second'''
+        if self.wall_time <= 0:
+            return 0.0
+        return len(self.results) / self.wall_time
+
+    def __repr__(self):
+        return("BatchResult({} grids, {} solved, workers={}, {:.1f} grids/s)".format(
+            len(self.results), self.n_solved(), self.workers, self.throughput()))
+
+def solve_one(grid, engine="csp", propagator=None, var_ord=None, val_ord=None):
+    '''Solve one grid with models.solve_sudoku and return (solution,
+       SearchResult), solution being the solved grid or None. The
+       result's assignment is emptied so that it can be pickled without
+       the model.'''
+    result, var_array = models.solve_sudoku(grid, engine, propagator, var_ord, val_ord)
+    solution = result.grid(var_array) if result.solved() else None
+    result.assignment = {}
+    return solution, result
+
+def solve_chunk(grids, config):
+    '''Worker task: solve a list of grids, config being the arguments
+       of solve_one after the grid'''
+    return [solve_one(grid, *config) for grid in grids]
+
+def chunk_size(n_done, cpu_done):
+    '''size of the next chunk, given that n_done grids took cpu_done
+       seconds so far'''
+    if n_done == 0:
+        return 1
+    per_grid = cpu_done / n_done
+    if per_grid <= 0:
+        return MAX_CHUNK
+    return max(1, min(MAX_CHUNK, int(CHUNK_TIME / per_grid)))
+
+def solve_batch(grids, engine="csp", propagator=None, var_ord=None, val_ord=None,
+                workers=None, chunksize=None, min_parallel=16):
+    '''Solve every grid of the iterable grids and return a BatchResult
+       whose solutions and results are in the order of the input.
+
+       engine, propagator, var_ord and val_ord are passed on to
+       models.solve_sudoku. workers is the number of processes
+       (os.cpu_count() by default); chunksize fixes the number of grids
+       per task instead of sizing chunks adaptively. If there are fewer
+       than min_parallel grids, or workers is 1, the grids are solved in
+       the calling process.'''
+    wtime = time.perf_counter()
+    config = (engine, propagator, var_ord, val_ord)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+
+    source = iter(grids)
+    head = list(itertools.islice(source, min_parallel))
+    if workers == 1 or len(head) < min_parallel:
+        solved = solve_chunk(itertools.chain(head, source), config)
+        return BatchResult([s for s, r in solved], [r for s, r in solved], 0,
+                           time.perf_counter() - wtime)
+
+    source = itertools.chain(head, source)
+    solutions = []
+    results = []
+    pending = dict()        #future -> index of its first grid
+    n_sent = 0
+    n_done = 0
+    cpu_done = 0.0
+    exhausted = False
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            #keep two chunks per worker in flight
+            while not exhausted and len(pending) < 2 * workers:
+                chunk = list(itertools.islice(source, chunksize or chunk_size(n_done, cpu_done)))
+                if not chunk:
+                    exhausted = True
+                    break
+                pending[pool.submit(solve_chunk, chunk, config)] = n_sent
+                n_sent += len(chunk)
+                solutions.extend([None] * len(chunk))
+                results.extend([None] * len(chunk))
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                start = pending.pop(future)
+                for i, (solution, result) in enumerate(future.result()):
+                    solutions[start + i] = solution
+                    results[start + i] = result
+                    n_done += 1
+                    cpu_done += result.cpu_time
+    return BatchResult(solutions, results, workers, time.perf_counter() - wtime)
+
+def apply_prefix(grid, prefix):
+    '''return a copy of grid with the (row, col, value) decisions of
+       prefix filled in'''
+    grid = [list(row) for row in grid]
+    for r, c, val in prefix:
+        grid[r][c] = val
+    return grid
+
+def expand(grid, prefix, propagator):
+    '''Propagate the subtree of grid below prefix. Return None if
+       propagation finds it has no solution, [] if it leaves no open
+       cell, and otherwise the prefixes of its children: one for each
+       value of the open cell with the fewest values.'''
+    csp, var_array = models.sudoku_nary_ad(apply_prefix(grid, prefix))
+    status, prunings = propagator(csp)
+    if not status:
+        return None
+    best = None
+    for r, row in enumerate(var_array):
+        for c, var in enumerate(row):
+            size = var.cur_domain_size()
+            if not var.is_assigned() and size > 1 and (best is None or size < best[0]):
+                best = (size, r, c)
+    if best is None:
+        return []
+    size, r, c = best
+    return [prefix + ((r, c, val),) for val in var_array[r][c].cur_domain()]
+
+def split(grid, n_tasks, propagator):
+    '''Split the search tree of grid level by level until there are
+       at least n_tasks open subtrees (or no subtree can be split any
+       further). Return their prefixes, in the order in which search
+       would visit them; subtrees without solution are left out.'''
+    frontier = [()]
+    while len(frontier) < n_tasks:
+        children = []
+        grew = False
+        for prefix in frontier:
+            below = expand(grid, prefix, propagator)
+            if below is None:
+                continue
+            if below:
+                children.extend(below)
+                grew = True
+            else:
+                children.append(prefix)
+        frontier = children
+        if not grew:
+            break
+    return frontier
+
+_stop_event = None      #set in a worker process by init_worker
+
+def init_worker(stop_event):
+    '''Worker initializer: keep the event telling searches to stop'''
+    global _stop_event
+    _stop_event = stop_event
+
+def solve_prefix(grid, prefix, config):
+    '''Worker task: search the subtree of grid below prefix with BT,
+       config being (propagator, var_ord, val_ord). Return (solution,
+       SearchResult) like solve_one.'''
+    propagator, var_ord, val_ord = config
+    csp, var_array = models.sudoku_nary_ad(apply_prefix(grid, prefix))
+    solver = BT(csp)
+    if _stop_event is not None:
+        solver.stop = _stop_event.is_set
+    result = solver.bt_search(propagator, var_ord, val_ord, iterative=True)
+    solution = result.grid(var_array) if result.solved() else None
+    result.assignment = {}
+    return solution, result
+
+def fill(csp, var_array, solution):
+    '''Assign the solution grid found by a worker to the unassigned
+       Variables of var_array (a model of the same board built in this
+       process), as if BT had found it, and return the assignment of
+       every Variable. Nothing is assigned if solution is None.'''
+    assignment = {}
+    if solution is not None:
+        for r, row in enumerate(var_array):
+            for c, var in enumerate(row):
+                assignment[var] = solution[r][c]
+                if not var.is_assigned():
+                    var.assign(solution[r][c])
+                    csp.search_vars.append(var)
+    return assignment
+
+def solve_split(grid, propagator=None, var_ord=None, val_ord=None,
+                workers=None, n_tasks=None):
+    '''Solve one grid (with models.sudoku_nary_ad and BT) by searching
+       n_tasks subtrees (4 per worker by default) in parallel. Return
+       (SearchResult, var_array) like models.solve_sudoku; the counts
+       and CPU time of the result add up those of every subtree
+       searched (and of the split).'''
+    stime = time.process_time()
+    wtime = time.perf_counter()
+    if propagator is None:
+        propagator = prop_GAC
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    csp, var_array = models.sudoku_nary_ad(grid)
+    if workers == 1:
+        result = BT(csp).bt_search(propagator, var_ord, val_ord, iterative=True)
+        return result, var_array
+
+    prefixes = split(grid, n_tasks or 4 * workers, propagator)
+    config = (propagator, var_ord, val_ord)
+    solution = None
+    searched = []
+    stop = multiprocessing.Event()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(stop,)) as pool:
+        pending = [pool.submit(solve_prefix, grid, prefix, config) for prefix in prefixes]
+        while pending and solution is None:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                found, result = future.result()
+                searched.append(result)
+                if found is not None and solution is None:
+                    solution = found
+        if pending:
+            #a solution was found: stop the searches still running
+            stop.set()
+            for future in pending:
+                future.cancel()
+            for future in wait(pending)[0]:
+                if not future.cancelled():
+                    searched.append(future.result()[1])
+
+    assignment = fill(csp, var_array, solution)
+    cpu_time = time.process_time() - stime + sum(r.cpu_time for r in searched)
+    result = SearchResult(SearchResult.SOLVED if solution is not None
+                          else SearchResult.NO_SOLUTION, assignment,
+                          sum(r.decisions for r in searched),
+                          sum(r.prunings for r in searched),
+                          time.perf_counter() - wtime, cpu_time)
+    return result, var_array
+
+def config_name(config):
+    '''name of a (propagator, var_ord, val_ord) configuration, e.g.
+       "prop_GAC+ord_dom_wdeg"'''
+    return "+".join(f.__name__ for f in config if f is not None)
+
+def run_config(results, index, model, board, config):
+    '''Portfolio process: solve board with configuration config and
+       put (index, solution, SearchResult) on the results queue'''
+    propagator, var_ord, val_ord = config
+    csp, var_array = model(board)
+    result = BT(csp).bt_search(propagator, var_ord, val_ord, iterative=True)
+    solution = result.grid(var_array) if result.solved() else None
+    result.assignment = {}
+    results.put((index, solution, result))
+
+def solve_portfolio(board, configs=None, model=None, timeout=None, log=None):
+    '''Race the configurations (propagator, var_ord, val_ord) of
+       configs (PORTFOLIO by default) on board, each in its own
+       process, and return (SearchResult, var_array, winner) for the
+       first one to finish, winner being the name of its configuration.
+
+       model builds the CSP from board (models.sudoku_nary_ad by
+       default); it, like the configurations, must be a module level
+       function. If no configuration finishes within timeout seconds the
+       result has status SearchResult.STOPPED and winner is None. If log
+       is a file name, a JSON line describing the race is appended to
+       it.'''
+    wtime = time.perf_counter()
+    if configs is None:
+        configs = PORTFOLIO
+    if model is None:
+        model = models.sudoku_nary_ad
+    csp, var_array = model(board)
+
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=run_config, daemon=True,
+                                     args=(results, i, model, board, config))
+             for i, config in enumerate(configs)]
+    for p in procs:
+        p.start()
+    first = None
+    try:
+        while first is None:
+            try:
+                first = results.get(timeout=0.05)
+            except queue.Empty:
+                if timeout is not None and time.perf_counter() - wtime > timeout:
+                    break
+                if not any(p.is_alive() for p in procs):
+                    #a result may still be on its way through the queue
+                    try:
+                        first = results.get(timeout=0.05)
+                    except queue.Empty:
+                        pass
+                    break
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+        for p in procs:
+            p.join()
+
+    if first is None:
+        winner = None
+        result = SearchResult(SearchResult.STOPPED, {}, 0, 0,
+                              time.perf_counter() - wtime, 0.0)
+    else:
+        index, solution, found = first
+        winner = config_name(configs[index])
+        result = SearchResult(found.status, fill(csp, var_array, solution),
+                              found.decisions, found.prunings,
+                              time.perf_counter() - wtime, found.cpu_time)
+    if log is not None:
+        with open(log, "a") as f:
+            f.write(json.dumps({"csp": csp.name,
+                                "configs": [config_name(c) for c in configs],
+                                "winner": winner,
+                                "status": result.status,
+                                "decisions": result.decisions,
+                                "wall_time": result.wall_time}) + "\n")
+    return result, var_array, winner
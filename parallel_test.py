@@ -0,0 +1,147 @@
+from cspbase import *
+from propagators import *
+from heuristics import *
+from benchmarks.corpora import corpus
+import os
+import json
+import tempfile
+import multiprocessing
+import models
+import parallel
+
+'''
+Checks of the parallel drivers: whatever the number of processes, the
+grids must come back in input order with the solutions the sequential
+solvers find.
+Run with python parallel_test.py (or pytest).
+'''
+
+#hard-1 of the sample corpus with a wrong value in cell (0, 1): GAC
+#does not find the contradiction before search
+name, level, no_solution = corpus(["hard"])[0]
+no_solution = [list(row) for row in no_solution]
+no_solution[0][1] = 2
+
+def temp_path():
+    fd, path = tempfile.mkstemp(suffix=".jsonl")
+    os.close(fd)
+    return path
+
+def sequential(grid):
+    '''the solution models.solve_sudoku finds for grid, or None'''
+    result, var_array = models.solve_sudoku(grid)
+    return result.grid(var_array) if result.solved() else None
+
+def test_batch_order():
+    grids = [grid for name, level, grid in corpus(["easy", "medium"])] * 6
+    grids.insert(3, no_solution)
+    expected = [sequential(grid) for grid in grids]
+    for workers, chunksize in [(2, None), (2, 3), (3, 1)]:
+        batch = parallel.solve_batch(iter(grids), workers=workers, chunksize=chunksize,
+                                     min_parallel=4)
+        assert batch.workers == workers
+        assert batch.solutions == expected
+        assert [r.solved() for r in batch.results] == [s is not None for s in expected]
+        assert batch.n_solved() == len(grids) - 1
+
+def test_batch_in_process():
+    #too few grids to start a pool, or a single worker
+    grids = [grid for name, level, grid in corpus(["easy"])] + [no_solution]
+    expected = [sequential(grid) for grid in grids]
+    for workers, min_parallel in [(2, 16), (1, 2)]:
+        batch = parallel.solve_batch(grids, workers=workers, min_parallel=min_parallel)
+        assert batch.workers == 0
+        assert batch.solutions == expected and len(batch) == len(grids)
+    try:
+        parallel.solve_batch(grids, workers=0)
+    except ValueError:
+        pass
+    else:
+        assert False, "accepted workers=0"
+
+def test_split():
+    name, level, grid = corpus(["hard"])[1]
+    prefixes = parallel.split(grid, 6, prop_GAC)
+    assert len(prefixes) >= 6
+    #the prefixes are decisions on the open cells, all different
+    assert len(set(prefixes)) == len(prefixes)
+    assert all(grid[r][c] == 0 for prefix in prefixes for r, c, val in prefix)
+    result, var_array = parallel.solve_split(grid, workers=2, n_tasks=6)
+    assert result.solved() and result.grid(var_array) == sequential(grid)
+    assert result.decisions > 0
+
+def test_split_no_solution():
+    #propagation at the root leaves open subtrees, none with a solution
+    assert len(parallel.split(no_solution, 4, prop_GAC)) == 4
+    result, var_array = parallel.solve_split(no_solution, workers=2)
+    assert result.status == SearchResult.NO_SOLUTION
+    assert not any(var.is_assigned() for row, grow in zip(var_array, no_solution)
+                   for var, val in zip(row, grow) if not val)
+    #a contradiction propagation finds leaves nothing to search
+    grid = [[1, 1, 0, 0], [0] * 4, [0] * 4, [0] * 4]
+    assert parallel.split(grid, 4, prop_GAC) == []
+    result, var_array = parallel.solve_split(grid, workers=2)
+    assert result.status == SearchResult.NO_SOLUTION
+
+def test_split_stop():
+    #the empty grid has solutions in every subtree: the first one found
+    #stops the other searches and cancels the subtrees not started
+    grid = [[0] * 9 for i in range(9)]
+    result, var_array = parallel.solve_split(grid, workers=2, n_tasks=16)
+    solution = result.grid(var_array)
+    assert result.solved()
+    assert all(sorted(row) == list(range(1, 10)) for row in solution)
+    #a search started once the stop event is set gives up at once
+    stop = multiprocessing.Event()
+    stop.set()
+    parallel.init_worker(stop)
+    try:
+        solution, result = parallel.solve_prefix(grid, (), (prop_GAC, None, None))
+    finally:
+        parallel.init_worker(None)
+    assert solution is None and result.status == SearchResult.STOPPED
+
+def read_log(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+def test_portfolio():
+    name, level, grid = corpus(["hard"])[0]
+    path = temp_path()
+    try:
+        result, var_array, winner = parallel.solve_portfolio(grid, log=path)
+        assert result.solved() and result.grid(var_array) == sequential(grid)
+        names = [parallel.config_name(config) for config in parallel.PORTFOLIO]
+        assert winner in names
+        log = read_log(path)
+        assert len(log) == 1
+        assert log[0]["winner"] == winner and log[0]["configs"] == names
+        assert log[0]["status"] == SearchResult.SOLVED
+    finally:
+        os.remove(path)
+
+def test_portfolio_timeout():
+    #plain backtracking on the binary model does not solve a hard grid
+    #in a second: the race is stopped and logged without a winner
+    name, level, grid = corpus(["hard"])[0]
+    path = temp_path()
+    try:
+        result, var_array, winner = parallel.solve_portfolio(
+            grid, configs=[(prop_BT, None, None)], model=models.sudoku,
+            timeout=1, log=path)
+        assert result.status == SearchResult.STOPPED and winner is None
+        assert 1 <= result.wall_time < 10
+        assert not any(var.is_assigned() for row, grow in zip(var_array, grid)
+                       for var, val in zip(row, grow) if not val)
+        log = read_log(path)
+        assert log[0]["winner"] is None and log[0]["status"] == SearchResult.STOPPED
+        assert log[0]["configs"] == ["prop_BT"]
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    for test in [test_batch_order, test_batch_in_process, test_split,
+                 test_split_no_solution, test_split_stop, test_portfolio,
+                 test_portfolio_timeout]:
+        test()
+        print(test.__name__, "passed")
@@ -20,11 +20,20 @@ A propagator is a function with the following template:
     
     the prop returns True/False and a list of variable-value pairs;
         the former indicates whether a DWO did NOT occur,
-        and the latter specifies each value that was pruned
-     
+        and the latter specifies each value that was pruned directly
+        with Variable.prune_value (empty when pruning through the CSP)
+
+Values are pruned with csp.prune_value(var, val), which records the
+pruning on the CSP's trail; bt_search undoes a decision by popping the
+trail, so no list of prunings has to be built and returned.
+
 The propagator SHOULD NOT prune a value that has already been pruned
 or prune a value twice
 
+When a propagator detects a dead end it increments the weight of the
+constraint responsible (c.weight), which the dom/wdeg variable ordering
+in heuristics.py uses.
+
 In summary, this is what the propagator must do:
 
     If newly_instantiated_variable = None
@@ -33,7 +42,8 @@ In summary, this is what the propagator must do:
             we do nothing...return true, []
 
         for forward checking;
-            we check all unary constraints of the CSP
+            we check all unary constraints of the CSP (and any constraint
+            left with a single unassigned variable by pre-assigned ones)
             
         for gac;
             we establish initial GAC by initializing the GAC queue
@@ -51,8 +61,148 @@ In summary, this is what the propagator must do:
 
          for gac;
             we initialize the GAC queue with all constraints containing V
+
+prop_GAC_residual is GAC with residual supports: for every constraint,
+variable and value it remembers where in the relation's support list
+the last support was found and resumes the next search for a support
+there, so repeated revisions during search rarely rescan tuples that
+were already found invalid.
+
+When csp.support_counts is being gathered (see val_lcv in
+heuristics.py) the propagators count there, for every value they find
+supported, the values of the other variables in its support: from the
+supporting tuple of a table constraint, or through the constraint's
+count_supports (e.g., the supported values the all-different filter
+computed). prop_FC only looks at constraints left with one unassigned
+variable, so its counts are much sparser than those of GAC.
+
+The GAC propagators share a GACQueue of constraints waiting to be
+revised. Whenever a value of a variable is pruned, exactly the other
+constraints on that variable are (re)queued.
    '''
 
+import heapq
+from collections import deque
+
+class GACQueue:
+    '''Queue of constraints waiting to be revised by a GAC propagator.
+
+       Constraints are kept in a deque (or, with priority=True, a heap
+       ordered by arity so that small, cheap constraints are revised
+       first) together with a set of the queued constraints, so that
+       pushing, popping and the "already queued?" test are O(1)
+       (O(log n) with priority).'''
+
+    def __init__(self, cons=(), priority=False):
+        self.priority = priority
+        self.queued = set()
+        self.count = 0          #pushes so far, keeps the heap FIFO on ties
+        if priority:
+            self.heap = []
+        else:
+            self.queue = deque()
+        for c in cons:
+            self.push(c)
+
+    def push(self, c):
+        '''Queue constraint c unless it is queued already'''
+        if c in self.queued:
+            return
+        self.queued.add(c)
+        if self.priority:
+            heapq.heappush(self.heap, (len(c.scope), self.count, c))
+        else:
+            self.queue.append(c)
+        self.count += 1
+
+    def push_cons_of(self, csp, var, skip=None):
+        '''Queue every constraint of csp whose scope contains var,
+           except skip (the constraint that pruned var)'''
+        for c in csp.vars_to_cons[var]:
+            if c is not skip:
+                self.push(c)
+
+    def pop(self):
+        '''Remove and return the next constraint to revise'''
+        if self.priority:
+            c = heapq.heappop(self.heap)[2]
+        else:
+            c = self.queue.popleft()
+        self.queued.discard(c)
+        return c
+
+    def __len__(self):
+        return len(self.queued)
+
+def prune_unsupported(csp, c, var, val):
+    '''Prune val, found to have no support in constraint c, from var.
+       Return False (bumping c's weight) if that is a dead end: var's
+       domain is wiped out, or var is assigned val, which cannot be
+       pruned.'''
+    if var.is_assigned():
+        c.weight += 1
+        return False
+    csp.prune_value(var, val)
+    if var.cur_domain_size() == 0:
+        c.weight += 1
+        return False
+    return True
+
+def count_tuple(counts, c, var, t):
+    '''Count the values of the other variables in t, the supporting
+       tuple of a value of var in constraint c'''
+    for x, b in zip(c.scope, t):
+        if x is not var:
+            counts[(x, b)] = counts.get((x, b), 0) + 1
+
+def gac_enforce(csp, Q, support):
+    '''Revise the constraints in the GACQueue Q until it is empty,
+       pruning every value for which support(c, var, val) is false.
+       Return False as soon as a domain wipe out occurs.
+
+       support returns the supporting tuple it found, True if it does
+       not produce one, or None/False if there is no support. The
+       supports are counted in csp.support_counts if it is gathered.'''
+    counts = csp.support_counts
+    while Q:
+        c = Q.pop()
+        for var in c.get_scope():
+            for val in var.cur_domain():
+                t = support(c, var, val)
+                if not t:
+                    if not prune_unsupported(csp, c, var, val):
+                        return False
+                    # constraints on var may have lost supports
+                    Q.push_cons_of(csp, var, c)
+                elif counts is not None and t is not True:
+                    count_tuple(counts, c, var, t)
+        if counts is not None and c.relation is None:
+            c.count_supports(counts)
+    return True
+
+def fc_check(csp, c, var):
+    '''Prune the values of var, the only unassigned variable of
+       constraint c, that have no support in c. Return False on a dead
+       end. The supports are counted in csp.support_counts if it is
+       gathered.'''
+    counts = csp.support_counts
+    for val in var.cur_domain():
+        # check all value in var's domain
+        if counts is None:
+            supported = c.has_support(var, val)
+        else:
+            t = table_support(c, var, val)
+            supported = bool(t)
+            if t and t is not True:
+                count_tuple(counts, c, var, t)
+        if not supported:
+            # this val doesn't work; we prune (DWO ends it)
+            if not prune_unsupported(csp, c, var, val):
+                return False
+    if counts is not None and c.relation is None:
+        c.count_supports(counts)
+    return True
+
 def prop_BT(csp, newVar=None):
     if not newVar:
         return True, []
@@ -63,84 +213,78 @@ def prop_BT(csp, newVar=None):
             for var in vars:
                 vals.append(var.get_assigned_value())
             if not c.check(vals): # if VIOLATED(C)
+                c.weight += 1
                 return False, []
     return True, []
 
 def prop_FC(csp, newVar=None):
     if not newVar:
-        # check all unary constraints of the CSP
-        pruned = []
+        # check all unary constraints of the CSP, as well as constraints
+        # left with one unassigned variable by variables that were
+        # assigned before search started (e.g. clues)
         for c in csp.get_all_cons():
-            vars = c.get_scope()
-            if len(vars) == 1: 
-                # c is unary
-                var = vars[0]
-                for val in var.cur_domain():
-                    # check all value in var's domain
-                    if not c.check([val]):
-                        # this val doesn't work; we prune
-                        var.prune_value(val)
-                        pruned.append([var, val])
-                        if var.cur_domain_size() == 0:
-                            # DWO!
-                            return False, pruned
+            if c.get_n_unasgn() == 1:
+                if not fc_check(csp, c, c.get_unasgn_vars()[0]):
+                    return False, []
         # finsihed checking all constraints
-        return True, pruned
+        return True, []
     
     # check all constraints with V that have one unassigned variable
-    pruned = []
     for c in csp.get_cons_with_var(newVar):
         if c.get_n_unasgn() == 1: 
             # c is almost bound
-            var = c.get_unasgn_vars()[0]
-            for val in var.cur_domain():
-                if not c.has_support(var, val):
-                    var.prune_value(val)
-                    pruned.append([var, val])
-                    if var.cur_domain_size() == 0:
-                        return False, pruned
-    return True, pruned
-
-def prop_GAC(csp, newVar=None):
+            if not fc_check(csp, c, c.get_unasgn_vars()[0]):
+                return False, []
+    return True, []
+
+def table_support(c, var, val):
+    '''Support test of prop_GAC: the supporting tuple found by the
+       constraint, or its own has_support if it has no table'''
+    if c.relation is None:
+        return True if c.has_support(var, val) else None
+    return c.find_support(var, val)
+
+def prop_GAC(csp, newVar=None, priority=False):
     if not newVar:
         # establish initial GAC by initializing the GAC queue
         # with all constaints of the CSP
-        pruned = []
-        Q = []
-        for all_con in csp.get_all_cons():
-            Q.append(all_con)
-        while Q:
-            c = Q.pop(0)
-            vars = c.get_scope()
-            for var in vars:
-                for val in var.cur_domain():
-                    if not c.has_support(var, val):
-                        var.prune_value(val)
-                        pruned.append([var, val])
-                        if var.cur_domain_size() == 0:
-                            return False, pruned
-                        else:
-                            for new_c in csp.get_cons_with_var(var):
-                                if new_c != c and new_c not in Q and var in new_c.get_scope():
-                                    Q.append(new_c)
-        return True, pruned
-    # initialize the GAC queue with all constraints containing V
-    pruned = []
-    Q = []
-    for c in csp.get_cons_with_var(newVar):
-        Q.append(c)
-    while Q:
-        c = Q.pop(0)
-        vars = c.get_scope()
-        for var in vars:
-            for val in var.cur_domain():
-                if not c.has_support(var, val):
-                    var.prune_value(val)
-                    pruned.append([var, val])
-                    if var.cur_domain_size() == 0:
-                        return False, pruned
-                    else:
-                        for new_c in csp.get_cons_with_var(newVar):
-                            if new_c != c and newVar in new_c.get_scope() and new_c not in Q:
-                                Q.append(new_c)
-    return True, pruned
+        Q = GACQueue(csp.get_all_cons(), priority)
+    else:
+        # initialize the GAC queue with all constraints containing V
+        Q = GACQueue(csp.vars_to_cons[newVar], priority)
+    return gac_enforce(csp, Q, table_support), []
+
+def residual_support(c, var, val):
+    '''Return a support of var=val in constraint c (None if it has
+       none), starting the search at the last support found for it
+       (its residue).
+
+       The support list is scanned circularly from the residue, so every
+       tuple is still checked before failing. This keeps the search
+       correct after backtracking, when tuples before the residue may
+       have become valid again, without having to restore residues.'''
+    rel = c.relation
+    if rel is None:
+        # no table (e.g. all-different or function constraints)
+        return True if c.has_support(var, val) else None
+    key = (c.var_pos.get(var), val)
+    sup = rel.sup_tuples.get(key)
+    if not sup:
+        return None
+    n = len(sup)
+    start = c.residues.get(key, 0)
+    for k in range(n):
+        i = start + k
+        if i >= n:
+            i -= n
+        if c.tuple_is_valid(sup[i]):
+            c.residues[key] = i
+            return sup[i]
+    return None
+
+def prop_GAC_residual(csp, newVar=None, priority=False):
+    if not newVar:
+        Q = GACQueue(csp.get_all_cons(), priority)
+    else:
+        Q = GACQueue(csp.vars_to_cons[newVar], priority)
+    return gac_enforce(csp, Q, residual_support), []
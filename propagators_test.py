@@ -97,11 +97,11 @@ def solve_nQueens(n, propType, trace=False):
     if trace:
         solver.trace_on()
     if propType == 'BT':
-        solver.bt_search(prop_BT)
+        solver.bt_search(prop_BT, verbose=True)
     elif propType == 'FC':
-        solver.bt_search(prop_FC)
+        solver.bt_search(prop_FC, verbose=True)
     elif propType == 'GAC':
-        solver.bt_search(prop_GAC)
+        solver.bt_search(prop_GAC, verbose=True)
         
 #trace = True
 trace = False
@@ -0,0 +1,167 @@
+'''Streaming reading and writing of puzzles stored one per line.
+
+A line holds the N*N cells of a grid row by row, in one of two forms:
+
+    - compact: one character per cell, '.' or '0' for a blank and
+      1-9, then A-Z for 10-35 (so up to 25x25 grids), e.g. the usual 81
+      character lines of 9x9 puzzles. Anything after the first N*N
+      characters, separated by a comma or whitespace (e.g. the solution
+      column of a CSV dump), is ignored;
+
+    - separated: the cells as integers (0 for a blank) separated by
+      commas or whitespace, for any N.
+
+N is found from the length of the line. Blank lines and lines starting
+with '#' are skipped.
+
+read_puzzles(path) maps the file into memory and generates the grids
+(lists of N lists of ints, as models.sudoku takes them) one line at a
+time, so a file of any size is read in constant memory.
+write_puzzles(path, grids) writes grids as they are generated, in the
+compact form when N <= 35. solve_file(src, dst) chains the two with a
+solver, writing each solution as soon as it is found.
+'''
+
+import re
+import mmap
+
+from template import ModelTemplate
+
+SYMBOLS = "123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+VALUE = {ch: v + 1 for v, ch in enumerate(SYMBOLS)}
+VALUE.update({ch.lower(): v for ch, v in VALUE.items() if ch.isalpha()})
+VALUE.update({".": 0, "0": 0})     #blanks
+SEPARATORS = re.compile(r"[\s,;]+")
+
+def grid_side(cells):
+    '''return N if cells is the number of cells of an N x N sudoku grid
+       (N a perfect square), None otherwise'''
+    N = int(round(cells ** 0.5))
+    B = int(round(N ** 0.5))
+    if cells < 1 or N * N != cells or B * B != N:
+        return None
+    return N
+
+def parse_line(line):
+    '''Return the grid of a puzzle line (str), or None for a blank or
+       comment line. Raise ValueError if the line is not a puzzle.'''
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    tokens = SEPARATORS.split(line)
+    try:
+        if len(tokens[0]) > 2:
+            #compact form
+            cells = [VALUE[ch] for ch in tokens[0]]
+        else:
+            cells = [int(t) for t in tokens]
+        N = grid_side(len(cells))
+    except (KeyError, ValueError):
+        N = None
+    if N is None or min(cells) < 0 or max(cells) > N:
+        raise ValueError("not a puzzle line: {!r}".format(line[:80]))
+    return [cells[r * N:(r + 1) * N] for r in range(N)]
+
+def format_grid(grid):
+    '''return the puzzle line of grid (0 or None for a blank)'''
+    N = len(grid)
+    if N <= len(SYMBOLS):
+        return "".join(SYMBOLS[v - 1] if v else "." for row in grid for v in row)
+    return " ".join(str(v or 0) for row in grid for v in row)
+
+def read_lines(path):
+    '''Generate the lines (str, without the line end) of the file path,
+       reading it through a memory map. Raise ValueError at a line that
+       is not ASCII text.'''
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            #an empty file cannot be mapped
+            return
+        with mm:
+            number = 0
+            while True:
+                line = mm.readline()
+                if not line:
+                    return
+                number += 1
+                try:
+                    line = line.decode("ascii")
+                except UnicodeDecodeError as e:
+                    raise ValueError("{}, line {}: not ASCII text ({})".format(path, number, e.reason))
+                yield line.rstrip("\r\n")
+
+def read_puzzles(path):
+    '''Generate the grids of the puzzle file path, one per puzzle line'''
+    for number, line in enumerate(read_lines(path), 1):
+        try:
+            grid = parse_line(line)
+        except ValueError as e:
+            raise ValueError("{}, line {}: {}".format(path, number, e))
+        if grid is not None:
+            yield grid
+
+def write_puzzles(path, grids, append=False):
+    '''Write every grid of the iterable grids to path, one line each,
+       as they are generated. Return the number of grids written.'''
+    n = 0
+    with open(path, "a" if append else "w") as f:
+        for grid in grids:
+            f.write(format_grid(grid) + "\n")
+            n += 1
+    return n
+
+def same_size_chunks(grids, size):
+    '''Generate lists of at most size consecutive grids of the same N'''
+    chunk = []
+    for grid in grids:
+        if chunk and (len(chunk) == size or len(grid) != len(chunk[0])):
+            yield chunk
+            chunk = []
+        chunk.append(grid)
+    if chunk:
+        yield chunk
+
+def solutions(grids, engine="csp", propagator=None, var_ord=None, val_ord=None,
+              batch=1024):
+    '''Generate (grid, SearchResult, solution) for every grid of the
+       iterable grids, solution being None if there is none. The "csp"
+       engine solves as models.solve_sudoku does, on models stamped out
+       of one template.ModelTemplate per grid size; the "numpy" engine
+       solves batches of up to batch grids at once with
+       sudoku_np.solve_batch.'''
+    if engine == "numpy":
+        import sudoku_np
+        for chunk in same_size_chunks(grids, batch):
+            solved, results = sudoku_np.solve_batch(chunk)
+            for grid, result, solution in zip(chunk, results, solved):
+                yield grid, result, solution.tolist() if result.solved() else None
+        return
+    if engine != "csp":
+        raise ValueError("unknown sudoku engine {!r}".format(engine))
+    templates = dict()      #N -> ModelTemplate
+    for grid in grids:
+        N = len(grid)
+        if not N in templates:
+            templates[N] = ModelTemplate(N)
+        result, var_array = templates[N].solve(grid, propagator, var_ord, val_ord)
+        yield grid, result, result.grid(var_array) if result.solved() else None
+
+def solve_file(src, dst, engine="csp", propagator=None, var_ord=None, val_ord=None,
+               batch=1024):
+    '''Solve every puzzle of the file src and write, line for line, its
+       solution to dst (the puzzle itself, blanks and all, if it has no
+       solution). Return (puzzles, solved).'''
+    counts = [0, 0]
+    def lines():
+        for grid, result, solution in solutions(read_puzzles(src), engine, propagator,
+                                                var_ord, val_ord, batch):
+            counts[0] += 1
+            if solution is not None:
+                counts[1] += 1
+                yield solution
+            else:
+                yield grid
+    write_puzzles(dst, lines())
+    return counts[0], counts[1]
@@ -0,0 +1,85 @@
+import os
+import tempfile
+
+from puzzle_io import *
+from benchmarks.corpora import corpus
+
+'''
+Checks of puzzle_io: puzzle files written with write_puzzles read back
+the same, in either line form.
+Run with python puzzle_io_test.py (or pytest).
+'''
+
+def temp_path():
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+    return path
+
+def test_round_trip():
+    #9x9, 16x16 and 25x25 grids, all in the compact form
+    grids = [grid for name, level, grid in corpus(["easy", "hard", "large"])]
+    path = temp_path()
+    try:
+        assert write_puzzles(path, iter(grids)) == len(grids)
+        assert list(read_puzzles(path)) == grids
+        assert write_puzzles(path, grids[:1], append=True) == 1
+        assert list(read_puzzles(path)) == grids + grids[:1]
+    finally:
+        os.remove(path)
+
+def test_parse_line():
+    grid = [[1, 0, 0, 0], [0, 0, 3, 0], [0, 4, 0, 0], [0, 0, 0, 2]]
+    line = format_grid(grid)
+    assert line == "1.....3..4.....2"
+    assert parse_line(line) == grid
+    assert parse_line(line.replace(".", "0") + ",solution") == grid
+    assert parse_line("1 0 0 0, 0 0 3 0, 0 4 0 0, 0 0 0 2") == grid
+    assert parse_line("  ") is None and parse_line("# comment") is None
+    for bad in ["1234", "1.....3..4.....5", "1 2 3", "1 0 0 0 0 0 3 0 0 4 0 0 0 0 0 -2"]:
+        try:
+            parse_line(bad)
+        except ValueError:
+            continue
+        assert False, bad
+
+def test_bad_file():
+    path = temp_path()
+    try:
+        for data, number in [(b"1.....3..4.....2\n\n1 2 3\n", 3),
+                             (b"# comment\n1.....3..4.....2\r\n\xe9.....3..4.....2\n", 3)]:
+            with open(path, "wb") as f:
+                f.write(data)
+            try:
+                list(read_puzzles(path))
+            except ValueError as e:
+                assert str(e).startswith("{}, line {}:".format(path, number)), e
+            else:
+                assert False, data
+    finally:
+        os.remove(path)
+
+def test_solve_file():
+    grids = [grid for name, level, grid in corpus(["easy"])]
+    grids.append([[1, 1, 0, 0], [0] * 4, [0] * 4, [0] * 4])   #no solution
+    full = [[1, 2, 3, 4], [3, 4, 1, 2], [2, 1, 4, 3], [4, 3, 2, 1]]
+    full[0][0], full[0][1] = full[0][1], full[0][0]
+    grids.append(full)                                      #nor this
+    src = temp_path()
+    dst = temp_path()
+    try:
+        write_puzzles(src, grids)
+        assert solve_file(src, dst) == (4, 2)
+        out = list(read_puzzles(dst))
+        assert out[2:] == grids[2:]
+        for grid, solution in zip(grids[:2], out[:2]):
+            assert all(not v or v == s for row, srow in zip(grid, solution)
+                       for v, s in zip(row, srow))
+            assert all(sorted(row) == list(range(1, 10)) for row in solution)
+    finally:
+        os.remove(src)
+        os.remove(dst)
+
+if __name__ == "__main__":
+    for test in [test_round_trip, test_parse_line, test_bad_file, test_solve_file]:
+        test()
+        print(test.__name__, "passed")
@@ -0,0 +1,119 @@
+from cspbase import *
+from propagators import *
+from heuristics import *
+import models
+
+'''
+Checks of BT's search: solution enumeration and counting, and the
+value orderings.
+Run with python search_test.py (or pytest).
+'''
+
+def empty_grid(n):
+    return [[0] * n for i in range(n)]
+
+def chain(n):
+    '''Return a CSP of n variables over [1, 2] where neighbours differ,
+       which has 2 solutions'''
+    vars = [Variable('V{}'.format(i), [1, 2]) for i in range(n)]
+    csp = CSP("Chain", vars)
+    for i in range(n - 1):
+        c = Constraint("C(V{},V{})".format(i, i + 1), [vars[i], vars[i + 1]])
+        c.add_satisfying_tuples([(1, 2), (2, 1)])
+        csp.add_constraint(c)
+    return csp
+
+def test_count_solutions():
+    csp, var_array = models.sudoku_nary_ad(empty_grid(4))
+    assert BT(csp).count_solutions(prop_GAC) == 288
+    assert BT(csp).count_solutions(prop_GAC, limit=2) == 2
+    assert BT(chain(4)).count_solutions(prop_FC) == 2
+
+def test_count_after_limited_count():
+    #a count stopped by its limit must not leave prunings behind
+    csp, var_array = models.sudoku_nary_ad(empty_grid(4))
+    assert BT(csp).count_solutions(prop_GAC, limit=1) == 1
+    assert csp.trail.top == 0
+    assert BT(csp).count_solutions(prop_GAC) == 288
+
+def test_count_after_closed_generator():
+    csp = chain(4)
+    solutions = BT(csp).bt_solutions(prop_GAC)
+    next(solutions)
+    solutions.close()
+    assert not any(var.is_assigned() for var in csp.vars)
+    assert all(var.cur_domain_size() == 2 for var in csp.vars)
+    assert BT(csp).count_solutions(prop_GAC) == 2
+
+def solved_grid():
+    csp, var_array = models.sudoku_nary_ad(empty_grid(9))
+    return BT(csp).bt_search(prop_GAC).grid(var_array)
+
+def test_conflicting_clues():
+    #a full grid with a repeated value, and one with two cells swapped:
+    #no propagator looks at constraints whose variables are all clues
+    repeated = solved_grid()
+    repeated[0][0] = repeated[0][1]
+    swapped = solved_grid()
+    swapped[0][0], swapped[0][1] = swapped[0][1], swapped[0][0]
+    for grid in [repeated, swapped]:
+        for model in [models.sudoku, models.sudoku_nary_ad]:
+            for propagator in [prop_BT, prop_FC, prop_GAC, prop_GAC_residual]:
+                csp, var_array = model(grid)
+                result = BT(csp).bt_search(propagator)
+                assert result.status == SearchResult.NO_SOLUTION
+        result, var_array = models.solve_sudoku(grid)
+        assert not result.solved()
+    #with blanks left the conflict is found before any search
+    repeated[8] = [0] * 9
+    csp, var_array = models.sudoku_nary_ad(repeated)
+    assert BT(csp).bt_search(prop_FC).decisions == 0
+
+def test_gac_fails_on_assigned_conflict():
+    #two assigned variables of a chain that break both of their
+    #constraints: GAC must fail instead of requeueing them forever
+    csp = chain(3)
+    x, y, z = csp.vars
+    x.assign(1)
+    z.assign(1)
+    y.prune_value(2)
+    y.assign(1)
+    for propagator in [prop_GAC, prop_GAC_residual]:
+        status, prunings = propagator(csp)
+        assert not status and csp.trail.top == 0
+
+def test_lcv_order():
+    #after GAC on the clues, cell (0, 3) has 3 and 4 left; 4 is also in
+    #fewer domains of its row, column and box than 3, so it supports
+    #more values there and goes first
+    grid = [[0, 0, 2, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 4, 0, 1]]
+    csp, var_array = models.sudoku_nary_ad(grid)
+    csp.support_counts = dict()
+    status, prunings = prop_GAC(csp)
+    var = var_array[0][3]
+    assert var.cur_domain() == [3, 4]
+    assert csp.support_counts[(var, 4)] > csp.support_counts[(var, 3)]
+    assert val_lcv(csp, var) == [4, 3]
+    #a decision starts the counts afresh
+    solver = BT(csp)
+    solver.bt_search(prop_GAC, ord_mrv, val_lcv)
+    assert all(csp.support_counts.get((var, val), 0) == 0 for val in [3, 4])
+
+def test_lcv_search():
+    grid = [[0, 0, 2, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 4, 0, 1]]
+    for propagator in [prop_FC, prop_GAC]:
+        csp, var_array = models.sudoku_nary_ad(grid)
+        result = BT(csp).bt_search(propagator, ord_mrv, val_lcv)
+        solution = result.grid(var_array)
+        assert result.solved()
+        for i in range(4):
+            assert sorted(solution[i]) == [1, 2, 3, 4]
+            assert sorted(row[i] for row in solution) == [1, 2, 3, 4]
+
+if __name__ == "__main__":
+    for test in [test_count_solutions, test_count_after_limited_count,
+                 test_count_after_closed_generator, test_conflicting_clues,
+                 test_gac_fails_on_assigned_conflict, test_lcv_order,
+                 test_lcv_search]:
+        test()
+        print(test.__name__, "passed")
@@ -0,0 +1,197 @@
+'''Incremental solving of a grid whose clues change one at a time, e.g.,
+in an interactive front end.
+
+A SudokuSession builds the model of a grid once and keeps it propagated
+on the CSP's Trail. Each clue added after the start opens a trail level,
+is assigned and is propagated from its Variable only (propagator(csp,
+var)). Taking out the clue added last just pops its level; taking out
+an earlier one pops the levels down to it and adds the clues after it
+again. Only taking out one of the clues the session started with
+propagates everything again.
+
+Questions are answered from that propagated state:
+
+    candidates(r, c) ==> the values left for cell (r, c)
+    consistent()     ==> False if propagation found the clues contradict
+    solution()       ==> a solution grid (None if there is none)
+    solvable()       ==> True if there is a solution
+    hint()           ==> (r, c, value) for an open cell if the grid has a
+                         solution: a cell with one value left if there
+                         is one, otherwise the value of the most
+                         constrained open cell in a solution
+
+solution() searches from the propagated state. The solution found is
+kept: it stays a solution when a clue is taken out or when a clue that
+agrees with it is added, so most edits need no new search.
+'''
+
+import models
+from cspbase import BT
+from propagators import prop_GAC
+from heuristics import ord_mrv
+
+class SudokuSession:
+    '''A grid (a list of N lists of N ints, 0 for a blank) kept
+       propagated while its clues change.
+
+       model builds the CSP (models.sudoku_nary_ad by default);
+       propagator must accept a newly assigned variable, as prop_FC and
+       prop_GAC do; var_ord is used when a solution has to be searched.'''
+
+    def __init__(self, grid, model=models.sudoku_nary_ad, propagator=prop_GAC,
+                 var_ord=ord_mrv):
+        self.csp, self.var_array = model(grid)
+        self.propagator = propagator
+        self.var_ord = var_ord
+        self.solver = BT(self.csp)
+        self.trail = self.csp.trail
+        self.cell = dict()      #Variable -> (row, col)
+        for r, row in enumerate(self.var_array):
+            for c, var in enumerate(row):
+                self.cell[var] = (r, c)
+        #clues propagated at the root, and clues added since (var, val,
+        #consistent before it was added), one trail level each
+        self.base = set(var for var in self.csp.vars if var.is_assigned())
+        self.added = []
+        self.ok = True
+        self.known_solution = None
+        self.known_unsolvable = False
+        self.restart()
+
+    def trail_prunings(self, prunings):
+        '''put prunings returned by a propagator on the trail'''
+        for var, val in prunings:
+            self.trail.push(var, val)
+
+    def restart(self):
+        '''Undo all propagation, propagate the root clues and add the
+           other clues again, in order'''
+        added = self.added
+        self.added = []
+        for var, val, ok in reversed(added):
+            if var.is_assigned():
+                var.unassign()
+        self.trail.clear()
+        self.ok = self.csp.check_assigned()
+        if self.ok:
+            self.ok, prunings = self.propagator(self.csp)
+            self.trail_prunings(prunings)
+        for var, val, ok in added:
+            self.add(var, val)
+
+    def add(self, var, val):
+        '''Add the clue var = val at a new trail level and propagate it'''
+        self.trail.mark()
+        self.added.append((var, val, self.ok))
+        if not self.ok:
+            return
+        if not var.in_cur_domain(val):
+            self.ok = False
+            return
+        var.assign(val)
+        self.ok, prunings = self.propagator(self.csp, var)
+        self.trail_prunings(prunings)
+
+    def remove(self, var):
+        '''Take var's clue out. Only the clue added last is taken out
+           by just popping the trail; for an earlier one, the clues
+           added after it are propagated again, so the cost grows with
+           their number. Raise ValueError if var has no clue.'''
+        if var in self.base:
+            self.base.discard(var)
+            var.unassign()
+            self.restart()
+            return
+        for i, (v, val, ok) in enumerate(self.added):
+            if v is var:
+                break
+        else:
+            raise ValueError("cell {} has no clue".format(var.name))
+        later = self.added[i + 1:]
+        for v, val, ok in reversed(self.added[i:]):
+            self.trail.undo()
+            if v.is_assigned():
+                v.unassign()
+        self.ok = self.added[i][2]
+        del self.added[i:]
+        for v, val, ok in later:
+            self.add(v, val)
+
+    def clue(self, r, c):
+        '''return the clue of cell (r, c), None if it has none'''
+        var = self.var_array[r][c]
+        if var in self.base:
+            return var.get_assigned_value()
+        for v, val, ok in self.added:
+            if v is var:
+                return val
+        return None
+
+    def set_clue(self, r, c, val):
+        '''Make val the clue of cell (r, c); 0 or None takes the clue
+           out. Return consistent().'''
+        var = self.var_array[r][c]
+        old = self.clue(r, c)
+        if old == val or (old is None and not val):
+            return self.ok
+        if old is not None:
+            self.remove(var)
+            self.known_unsolvable = False
+        if val:
+            self.add(var, val)
+            if self.known_solution is not None and self.known_solution[r][c] != val:
+                self.known_solution = None
+        return self.ok
+
+    def grid(self):
+        '''return the clues as a grid (0 for a blank)'''
+        return [[self.clue(r, c) or 0 for c in range(len(row))]
+                for r, row in enumerate(self.var_array)]
+
+    def consistent(self):
+        '''return False if propagating the clues found a contradiction
+           (True does not mean the grid has a solution)'''
+        return self.ok
+
+    def candidates(self, r, c):
+        '''return the values left for cell (r, c) by propagation'''
+        return self.var_array[r][c].cur_domain()
+
+    def solution(self):
+        '''return a solution grid, or None if the clues have none'''
+        if not self.ok or self.known_unsolvable:
+            return None
+        if self.known_solution is None:
+            result = self.solver.bt_search(self.propagator, self.var_ord, iterative=True)
+            if result.solved():
+                self.known_solution = result.grid(self.var_array)
+            else:
+                self.known_unsolvable = True
+            #back to the propagated state of the session
+            self.solver.undo_search()
+            self.csp.size_index = None
+        return self.known_solution
+
+    def solvable(self):
+        '''return True if the clues have a solution'''
+        return self.solution() is not None
+
+    def hint(self):
+        '''Return (r, c, value) for a cell without a value yet, or None
+           if the grid is full or has no solution'''
+        solution = self.solution()
+        if solution is None:
+            return None
+        best = None
+        for var in self.csp.vars:
+            if var.is_assigned():
+                continue
+            if var.cur_domain_size() == 1:
+                r, c = self.cell[var]
+                return r, c, var.cur_domain()[0]
+            if best is None or var.cur_domain_size() < best.cur_domain_size():
+                best = var
+        if best is None:
+            return None
+        r, c = self.cell[best]
+        return r, c, solution[r][c]
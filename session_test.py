@@ -0,0 +1,109 @@
+from propagators import *
+from session import SudokuSession
+import models
+
+'''
+Checks of session.SudokuSession: after any sequence of edits the session
+must be in the state of a session started afresh on the same clues.
+Run with python session_test.py (or pytest).
+'''
+
+puzzle = [[0, 0, 3, 0, 2, 0, 6, 0, 0],
+          [9, 0, 0, 3, 0, 5, 0, 0, 1],
+          [0, 0, 1, 8, 0, 6, 4, 0, 0],
+          [0, 0, 8, 1, 0, 2, 9, 0, 0],
+          [7, 0, 0, 0, 0, 0, 0, 0, 8],
+          [0, 0, 6, 7, 0, 8, 2, 0, 0],
+          [0, 0, 2, 6, 0, 9, 5, 0, 0],
+          [8, 0, 0, 2, 0, 3, 0, 0, 9],
+          [0, 0, 5, 0, 1, 0, 3, 0, 0]]
+
+def is_solution(solution, grid):
+    '''True iff solution is a solved grid keeping the clues of grid'''
+    N = len(grid)
+    B = int(round(N ** 0.5))
+    units = [[(r, c) for c in range(N)] for r in range(N)]
+    units += [[(r, c) for r in range(N)] for c in range(N)]
+    units += [[(br + i, bc + j) for i in range(B) for j in range(B)]
+              for br in range(0, N, B) for bc in range(0, N, B)]
+    for unit in units:
+        if sorted(solution[r][c] for r, c in unit) != list(range(1, N + 1)):
+            return False
+    return all(not grid[r][c] or grid[r][c] == solution[r][c]
+               for r in range(N) for c in range(N))
+
+def same_state(session, grid):
+    '''True iff session has the clues and consistency of a new session
+       on grid, and its candidates too (unless propagation found a
+       contradiction, where it stops partway)'''
+    fresh = SudokuSession(grid)
+    N = len(grid)
+    if session.grid() != grid or session.consistent() != fresh.consistent():
+        return False
+    return not fresh.consistent() or all(session.candidates(r, c) == fresh.candidates(r, c)
+                                         for r in range(N) for c in range(N))
+
+def test_edits_match_fresh_session():
+    session = SudokuSession(puzzle)
+    grid = [list(row) for row in puzzle]
+    solution = session.solution()
+    assert is_solution(solution, puzzle)
+    edits = [(0, 0, solution[0][0]),   #add a clue that agrees
+             (0, 1, solution[0][1]),
+             (4, 4, solution[4][4]),
+             (0, 0, 0),                 #take out an earlier added clue
+             (1, 0, 0),                 #take out one of the initial clues
+             (0, 1, 0),                 #take out the clue added last
+             (8, 8, 7),                 #add a clue that is wrong
+             (8, 8, 0)]
+    for r, c, val in edits:
+        session.set_clue(r, c, val)
+        grid[r][c] = val
+        assert same_state(session, grid)
+    assert is_solution(session.solution(), grid)
+
+def test_remove_without_clue():
+    session = SudokuSession(puzzle)
+    for edit in [False, True]:
+        if edit:
+            session.set_clue(0, 0, 4)
+        try:
+            session.remove(session.var_array[0][1])
+        except ValueError:
+            pass
+        else:
+            assert False, "removed the clue of an empty cell"
+        assert session.clue(0, 0) == (4 if edit else None)
+
+def test_unsolvable():
+    grid = [list(row) for row in puzzle]
+    session = SudokuSession(grid)
+    #a clue contradicting a row of the initial clues
+    session.set_clue(0, 0, 3)
+    assert not session.consistent()
+    assert session.solution() is None and session.hint() is None
+    session.set_clue(0, 0, 0)
+    assert session.consistent() and session.solvable()
+    #a full grid with two cells swapped, with any propagator
+    grid = [list(row) for row in session.solution()]
+    grid[0][0], grid[0][1] = grid[0][1], grid[0][0]
+    for propagator in [prop_BT, prop_FC, prop_GAC]:
+        session = SudokuSession(grid, propagator=propagator)
+        assert not session.consistent() and session.hint() is None
+
+def test_hint():
+    session = SudokuSession(puzzle)
+    r, c, val = session.hint()
+    assert puzzle[r][c] == 0 and session.solution()[r][c] == val
+    #forward checking leaves cell (3, 2) with one value, but the grid
+    #has no solution: no hint is given
+    grid = [[3, 0, 0, 0], [0, 0, 0, 0], [0, 0, 1, 3], [4, 0, 0, 2]]
+    session = SudokuSession(grid, propagator=prop_FC)
+    assert session.consistent() and session.candidates(3, 2) == [4]
+    assert session.hint() is None
+
+if __name__ == "__main__":
+    for test in [test_edits_match_fresh_session, test_remove_without_clue,
+                 test_unsolvable, test_hint]:
+        test()
+        print(test.__name__, "passed")
@@ -0,0 +1,236 @@
+'''Vectorized sudoku engine (requires NumPy).
+
+This is an alternative to building a CSP with models.sudoku and
+searching it with BT, for when the problem is a plain sudoku. The
+candidates of an N x N grid (N = B*B) are held in an (N, N, N) boolean
+array: cand[r, c, d] is True iff digit d+1 is still possible in cell
+(r, c). Propagation is done on the whole array at once:
+
+    - naked singles: the digit of a cell with one candidate is removed
+      from every other cell of its row, column and box;
+    - hidden singles: a digit with only one possible cell in a row,
+      column or box is placed there;
+
+and is repeated until nothing changes. What propagation leaves open is
+solved by depth-first search on the cell with the fewest candidates.
+
+solve(grid) takes the same grid as models.sudoku (a list of N lists of
+N ints, 0 or anything outside 1..N for a blank) and returns a
+SearchResult and a var_array: a list of lists of Cell objects which,
+like the Variables of models.sudoku, answer get_assigned_value().
+models.solve_sudoku(grid, engine="numpy") selects this engine.
+
+solve_batch(grids) solves a whole (P, N, N) stack of grids, running the
+propagation of all of them together and searching only the puzzles
+that propagation leaves open.
+'''
+
+import time
+import numpy as np
+
+from cspbase import SearchResult
+
+class Cell:
+    '''A solved (or given) cell of a grid. Mimics the part of the
+       Variable interface used to read a solution.'''
+
+    def __init__(self, name, value=None):
+        self.name = name
+        self.value = value
+
+    def is_assigned(self):
+        return self.value is not None
+
+    def get_assigned_value(self):
+        return self.value
+
+    def __repr__(self):
+        return("Cell-{}".format(self.name))
+
+def box_size(N):
+    '''return B such that N = B*B (the side of a box)'''
+    B = int(round(N ** 0.5))
+    if B * B != N:
+        raise ValueError("grid side {} is not a perfect square".format(N))
+    return B
+
+def candidates(grid):
+    '''return the (..., N, N, N) candidate array of a grid, or of a
+       stack of grids of shape (..., N, N)'''
+    g = np.asarray(grid, dtype=np.int64)
+    N = g.shape[-1]
+    given = (g >= 1) & (g <= N)
+    onehot = g[..., None] == np.arange(1, N + 1)
+    return np.where(given[..., None], onehot, True)
+
+def box_sum(x, B):
+    '''sum an (..., N, N, N) array over each box, giving (..., B, B, N)'''
+    lead = x.shape[:-3]
+    N = x.shape[-1]
+    return x.reshape(lead + (B, B, B, B, N)).sum(axis=(-4, -2))
+
+def box_spread(x, B):
+    '''spread a per-box (..., B, B, N) array back over the cells of
+       each box, giving (..., N, N, N)'''
+    lead = x.shape[:-3]
+    N = x.shape[-1]
+    x = np.broadcast_to(x[..., :, None, :, None, :], lead + (B, B, B, B, N))
+    return x.reshape(lead + (N, N, N))
+
+def propagate(cand, B):
+    '''Apply naked and hidden singles to the (N, N, N) candidate array
+       cand (in place) until nothing changes. Return False if a
+       contradiction was found.'''
+    return bool(propagate_batch(cand[None], B)[0])
+
+def propagate_batch(cand, B):
+    '''Apply naked and hidden singles to a stack of candidate arrays
+       of shape (P, N, N, N), in place, until nothing changes. All
+       puzzles still changing are processed together, by the same
+       array operations. Return a (P,) boolean array, False for the
+       puzzles in which a contradiction was found.'''
+    ok = np.ones(cand.shape[0], dtype=bool)
+    active = np.arange(cand.shape[0])
+    while active.size:
+        c = cand[active]
+        counts = c.sum(axis=3)
+        bad = ~counts.all(axis=(1, 2))
+        single = c & (counts == 1)[..., None]
+
+        #a placed digit may appear only once in a row, column or box
+        rs = single.sum(axis=2)
+        cs = single.sum(axis=1)
+        bs = box_sum(single, B)
+        bad |= ((rs.max(axis=(1, 2)) > 1) | (cs.max(axis=(1, 2)) > 1) |
+                (bs.max(axis=(1, 2, 3)) > 1))
+        taken = (rs[:, :, None, :] > 0) | (cs[:, None, :, :] > 0) | box_spread(bs > 0, B)
+        new = c & (single | ~taken)
+
+        #a digit must have a place in each row, column and box, and if
+        #it has only one that is where it goes
+        rc = new.sum(axis=2)
+        cc = new.sum(axis=1)
+        bc = box_sum(new, B)
+        bad |= ~(rc.all(axis=(1, 2)) & cc.all(axis=(1, 2)) & bc.all(axis=(1, 2, 3)))
+        hidden = new & ((rc == 1)[:, :, None, :] | (cc == 1)[:, None, :, :] |
+                        box_spread(bc == 1, B))
+        nhidden = hidden.sum(axis=3)
+        bad |= nhidden.max(axis=(1, 2)) > 1
+        new = np.where((nhidden == 1)[..., None], hidden, new)
+
+        changed = (new != c).any(axis=(1, 2, 3))
+        cand[active] = new
+        ok[active[bad]] = False
+        active = active[changed & ~bad]
+    return ok
+
+def search(cand, B, stats):
+    '''Depth-first search from the candidate array cand. Return the
+       solved candidate array, or None if there is no solution. stats
+       is a dict whose "decisions" and "prunings" counts are updated.'''
+    N = cand.shape[0]
+    stack = [cand]
+    while stack:
+        cand = stack.pop()
+        before = int(cand.sum())
+        ok = propagate(cand, B)
+        stats["prunings"] += before - int(cand.sum())
+        if not ok:
+            continue
+        counts = cand.sum(axis=2)
+        if (counts == 1).all():
+            return cand
+        #branch on the open cell with the fewest candidates
+        r, c = divmod(int(np.argmin(np.where(counts > 1, counts, N + 1))), N)
+        for d in np.flatnonzero(cand[r, c])[::-1]:
+            child = cand.copy()
+            child[r, c, :] = False
+            child[r, c, d] = True
+            stack.append(child)
+        stats["decisions"] += 1
+    return None
+
+def solve(grid):
+    '''Solve a sudoku grid. Return (SearchResult, var_array) where
+       var_array is a list of lists of Cells holding the solution (or
+       only the clues if there is none).'''
+    stime = time.process_time()
+    wtime = time.perf_counter()
+    N = len(grid)
+    B = box_size(N)
+    stats = {"decisions": 0, "prunings": 0}
+    cand = search(candidates(grid), B, stats)
+
+    var_array = []
+    for r in range(N):
+        row = []
+        for c in range(N):
+            if cand is not None:
+                value = int(np.argmax(cand[r, c])) + 1
+            elif 1 <= grid[r][c] <= N:
+                value = grid[r][c]
+            else:
+                value = None
+            row.append(Cell("{},{}".format(r + 1, c + 1), value))
+        var_array.append(row)
+
+    if cand is not None:
+        status = SearchResult.SOLVED
+        assignment = {cell: cell.value for row in var_array for cell in row}
+    else:
+        status = SearchResult.NO_SOLUTION
+        assignment = {}
+    result = SearchResult(status, assignment, stats["decisions"], stats["prunings"],
+                          time.perf_counter() - wtime, time.process_time() - stime)
+    return result, var_array
+
+def solve_batch(grids):
+    '''Solve a stack of sudoku grids, given as an array-like of shape
+       (P, N, N). Constraint propagation runs on the whole stack at
+       once; only the puzzles it leaves unresolved are searched, one at
+       a time.
+
+       Return (solutions, results): solutions is a (P, N, N) int array
+       (all 0 for a puzzle without solution) and results a list of P
+       SearchResults. Their assignment is left empty (the values are in
+       solutions); their times are the puzzle's share of the batch
+       propagation plus its own search time. An empty stack gives
+       ([], []).'''
+    g = np.asarray(grids, dtype=np.int64)
+    if g.shape[0] == 0:
+        return [], []
+    P, N = g.shape[0], g.shape[1]
+    B = box_size(N)
+
+    stime = time.process_time()
+    wtime = time.perf_counter()
+    cand = candidates(g)
+    before = cand.sum(axis=(1, 2, 3))
+    ok = propagate_batch(cand, B)
+    prunings = before - cand.sum(axis=(1, 2, 3))
+    #each puzzle's share of the batch propagation
+    share_cpu = (time.process_time() - stime) / max(P, 1)
+    share_wall = (time.perf_counter() - wtime) / max(P, 1)
+
+    solutions = np.zeros((P, N, N), dtype=np.int64)
+    solved = ok & (cand.sum(axis=3) == 1).all(axis=(1, 2))
+    solutions[solved] = cand[solved].argmax(axis=3) + 1
+
+    results = []
+    for i in range(P):
+        stats = {"decisions": 0, "prunings": int(prunings[i])}
+        cpu, wall = share_cpu, share_wall
+        status = SearchResult.SOLVED if solved[i] else SearchResult.NO_SOLUTION
+        if ok[i] and not solved[i]:
+            #propagation alone did not solve it: search
+            s_cpu = time.process_time()
+            s_wall = time.perf_counter()
+            sol = search(cand[i], B, stats)
+            if sol is not None:
+                solutions[i] = sol.argmax(axis=2) + 1
+                status = SearchResult.SOLVED
+            cpu += time.process_time() - s_cpu
+            wall += time.perf_counter() - s_wall
+        results.append(SearchResult(status, {}, stats["decisions"],
+                                    stats["prunings"], wall, cpu))
+    return solutions, results
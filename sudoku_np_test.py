@@ -0,0 +1,90 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from cspbase import SearchResult
+from benchmarks.corpora import corpus
+import models
+import sudoku_np
+
+'''
+Checks of the NumPy engine: sudoku_np.solve and solve_batch must find
+the solutions the CSP engine finds, and report grids without one.
+Skipped when NumPy is not installed.
+Run with python sudoku_np_test.py (or pytest).
+'''
+
+#a solved 9x9 grid with two cells of its first row swapped
+unsolvable = [[1, 2, 3, 4, 5, 6, 7, 8, 9],
+              [4, 5, 6, 7, 8, 9, 1, 2, 3],
+              [7, 8, 9, 1, 2, 3, 4, 5, 6],
+              [2, 3, 4, 5, 6, 7, 8, 9, 1],
+              [5, 6, 7, 8, 9, 1, 2, 3, 4],
+              [8, 9, 1, 2, 3, 4, 5, 6, 7],
+              [3, 4, 5, 6, 7, 8, 9, 1, 2],
+              [6, 7, 8, 9, 1, 2, 3, 4, 5],
+              [9, 1, 2, 3, 4, 5, 6, 7, 8]]
+unsolvable[0][0], unsolvable[0][1] = unsolvable[0][1], unsolvable[0][0]
+
+def is_solution(solution, grid):
+    '''True iff solution is a solved grid keeping the clues of grid'''
+    N = len(grid)
+    B = sudoku_np.box_size(N)
+    s = np.asarray(solution)
+    digits = list(range(1, N + 1))
+    boxes = s.reshape(B, B, B, B).swapaxes(1, 2).reshape(N, N)
+    for units in [s, s.T, boxes]:
+        if any(sorted(unit) != digits for unit in units.tolist()):
+            return False
+    g = np.asarray(grid)
+    return bool(((g == 0) | (g == s)).all())
+
+def csp_solution(grid):
+    result, var_array = models.solve_sudoku(grid)
+    return result.grid(var_array) if result.solved() else None
+
+def test_solve():
+    #the puzzles of "large" have more than one solution
+    for name, level, grid in corpus(["easy", "hard", "large"]):
+        result, var_array = sudoku_np.solve(grid)
+        assert result.solved(), name
+        assert is_solution(result.grid(var_array), grid), name
+        if level != "large":
+            assert result.grid(var_array) == csp_solution(grid), name
+
+def test_solve_unsolvable():
+    grid = [[1, 1, 0, 0], [0] * 4, [0] * 4, [0] * 4]
+    for g in [grid, unsolvable]:
+        result, var_array = sudoku_np.solve(g)
+        assert result.status == SearchResult.NO_SOLUTION
+        #var_array holds the clues
+        assert [[cell.get_assigned_value() or 0 for cell in row] for row in var_array] == g
+
+def test_solve_batch():
+    grids = [grid for name, level, grid in corpus(["easy", "medium", "hard"])]
+    grids.insert(1, unsolvable)
+    solutions, results = sudoku_np.solve_batch(grids)
+    assert solutions.shape == (len(grids), 9, 9) and len(results) == len(grids)
+    for grid, solution, result in zip(grids, solutions, results):
+        if grid is unsolvable:
+            assert result.status == SearchResult.NO_SOLUTION
+            assert not solution.any()
+        else:
+            assert result.solved()
+            assert solution.tolist() == csp_solution(grid)
+
+def test_solve_batch_empty():
+    assert sudoku_np.solve_batch([]) == ([], [])
+
+def test_engine():
+    for name, level, grid in corpus(["easy", "medium"]):
+        result, var_array = models.solve_sudoku(grid, engine="numpy")
+        assert result.grid(var_array) == csp_solution(grid)
+    with pytest.raises(ValueError):
+        models.solve_sudoku(grid, engine="fortran")
+
+if __name__ == "__main__":
+    for test in [test_solve, test_solve_unsolvable, test_solve_batch,
+                 test_solve_batch_empty, test_engine]:
+        test()
+        print(test.__name__, "passed")
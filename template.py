@@ -0,0 +1,161 @@
+'''Model templates: build the CSP of an empty grid once and stamp out the
+model of each puzzle from it.
+
+Building a model creates every Variable and constraint anew (810
+not-equal constraints for a 9x9 models.sudoku), which takes longer than
+solving an easy puzzle. The constraints of a sudoku do not depend on its
+clues, so a ModelTemplate builds the model of the empty N x N grid once
+and gives out per-puzzle models in two ways:
+
+    instance(grid) ==> resets the template's own CSP (every domain back
+                       to full, no assignments, no search state) and
+                       assigns the clues of grid. Nothing is allocated,
+                       so this costs microseconds, but the model returned
+                       is the same object every time: it is only valid
+                       until the next call.
+
+    clone(grid)    ==> a copy of the template's CSP with the clues of
+                       grid, independent of the template and of other
+                       clones (e.g., to keep several puzzles at once).
+                       Relations are not copied: they are never changed
+                       once built, so every clone shares the template's.
+                       A clone allocates every Variable and constraint
+                       again, so it costs about as much as building the
+                       model (with the relation cached) does.
+
+Both return (csp, var_array) as the models do. A template can be saved
+with pickle and loaded again, which is quicker than building it when a
+process starts, for example
+
+    ModelTemplate(9).save("sudoku9.pickle")
+    ...
+    tmpl = ModelTemplate.load("sudoku9.pickle")
+    for grid in grids:
+        csp, var_array = tmpl.instance(grid)
+        BT(csp).bt_search(prop_GAC)
+'''
+
+import pickle
+
+import models
+from cspbase import BT, Trail, FilteredConstraint
+
+def copy_object(obj):
+    '''Internal routine. Shallow copy of obj, leaving out instance
+       attributes that shadow its methods (e.g., the wrappers attached
+       by a monitor.Monitor, which act on obj itself)'''
+    new = object.__new__(type(obj))
+    new.__dict__.update(obj.__dict__)
+    for attr in list(new.__dict__):
+        if callable(getattr(type(obj), attr, None)):
+            del new.__dict__[attr]
+    return new
+
+class ModelTemplate:
+    '''The model of an empty N x N grid, built by model
+       (models.sudoku_nary_ad or models.sudoku), from which the models
+       of puzzles of that size are made'''
+
+    def __init__(self, N=9, model=models.sudoku_nary_ad):
+        self.N = N
+        self.csp, self.var_array = model([[0] * N for i in range(N)])
+
+    def save(self, path):
+        '''Pickle the template to the file path'''
+        self.reset()
+        with open(path, "wb") as f:
+            pickle.dump(self, f, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        '''Return the template pickled in the file path'''
+        with open(path, "rb") as f:
+            template = pickle.load(f)
+        if not isinstance(template, ModelTemplate):
+            raise ValueError("{} does not hold a ModelTemplate".format(path))
+        return template
+
+    def reset(self):
+        '''Put the template's CSP back in the state it was built in:
+           full domains, nothing assigned and no search state left'''
+        csp = self.csp
+        for var in csp.vars:
+            if var.is_assigned():
+                var.unassign()
+            var.restore_curdom()
+        for c in csp.cons:
+            c.weight = 1
+            c.residues.clear()
+            if isinstance(c, FilteredConstraint):
+                c.filtered_doms = None
+                c.supported = None
+        csp.trail = Trail()
+        csp.search_vars = []
+        csp.search_level = None
+        csp.size_index = None
+        csp.support_counts = None
+        csp.prune_counts = None
+
+    def set_clues(self, csp, var_array, grid):
+        '''Internal routine. Assign the clues of grid to var_array'''
+        if len(grid) != self.N:
+            raise ValueError("the template is for {} x {} grids, not {} rows".format(
+                self.N, self.N, len(grid)))
+        for row, vars in zip(grid, var_array):
+            for val, var in zip(row, vars):
+                if val:
+                    if not var.in_cur_domain(val):
+                        raise ValueError("{} is not a value of cell {}".format(val, var.name))
+                    var.assign(val)
+
+    def instance(self, grid):
+        '''Return (csp, var_array), the template's own model with the
+           clues of grid (0 for a blank). Valid until the next call.'''
+        self.reset()
+        self.set_clues(self.csp, self.var_array, grid)
+        return self.csp, self.var_array
+
+    def clone(self, grid=None):
+        '''Return (csp, var_array), a copy of the template's model of
+           its own with the clues of grid (if given)'''
+        self.reset()
+        csp = self.csp
+        #shallow copies (much quicker than copy.deepcopy) with the
+        #variables of the copy put in the scopes of its constraints
+        new = copy_object(csp)
+        copies = dict()
+        new.vars = []
+        for var in csp.vars:
+            v = object.__new__(type(var))
+            v.__dict__.update(var.__dict__)
+            v.dom = list(var.dom)
+            v.value_bit = dict(var.value_bit)
+            copies[var] = v
+            new.vars.append(v)
+        new.vars_to_cons = {v: [] for v in new.vars}
+        new.cons = []
+        for c in csp.cons:
+            c2 = copy_object(c)
+            c2.scope = [copies[var] for var in c.scope]
+            c2.var_pos = {var: i for i, var in enumerate(c2.scope)}
+            c2.residues = dict()
+            new.cons.append(c2)
+            for var in c2.scope:
+                new.vars_to_cons[var].append(c2)
+        new.trail = Trail()
+        new.search_vars = []
+        new.search_level = None
+        var_array = [[copies[var] for var in row] for row in self.var_array]
+        if grid is not None:
+            self.set_clues(new, var_array, grid)
+        return new, var_array
+
+    def solve(self, grid, propagator=None, var_ord=None, val_ord=None):
+        '''Solve grid on instance(grid) as models.solve_sudoku does and
+           return (SearchResult, var_array)'''
+        if propagator is None:
+            from propagators import prop_GAC
+            propagator = prop_GAC
+        csp, var_array = self.instance(grid)
+        result = BT(csp).bt_search(propagator, var_ord, val_ord, iterative=True)
+        return result, var_array
@@ -0,0 +1,68 @@
+import os
+import tempfile
+
+from cspbase import *
+from propagators import *
+from heuristics import *
+from template import ModelTemplate
+from benchmarks.corpora import corpus
+import models
+
+'''
+Checks of template.ModelTemplate: a model stamped out of a template,
+by instance or by clone, must search exactly like a model built afresh.
+Run with python template_test.py (or pytest).
+'''
+
+configs = [(prop_GAC, ord_mrv, None), (prop_GAC, None, val_lcv),
+           (prop_GAC_residual, ord_dom_wdeg, val_min_conflicts)]
+
+def same_search(csp, var_array, grid, model, config):
+    '''assert that searching csp with config gives the result it gives
+       on model(grid)'''
+    propagator, var_ord, val_ord = config
+    fresh, fresh_array = model(grid)
+    expected = BT(fresh).bt_search(propagator, var_ord, val_ord, iterative=True)
+    result = BT(csp).bt_search(propagator, var_ord, val_ord, iterative=True)
+    assert result.status == expected.status
+    assert result.decisions == expected.decisions
+    assert result.prunings == expected.prunings
+    assert result.grid(var_array) == expected.grid(fresh_array)
+
+def test_instance_and_clone():
+    grids = [grid for name, level, grid in corpus(["easy", "medium"])]
+    for model in [models.sudoku_nary_ad, models.sudoku]:
+        tmpl = ModelTemplate(9, model)
+        for config in configs[:1] if model is models.sudoku else configs:
+            for grid in grids:
+                csp, var_array = tmpl.instance(grid)
+                same_search(csp, var_array, grid, model, config)
+                csp, var_array = tmpl.clone(grid)
+                same_search(csp, var_array, grid, model, config)
+
+def test_clones_are_independent():
+    tmpl = ModelTemplate(4)
+    grid = [[1, 0, 0, 0], [0, 0, 3, 0], [0, 4, 0, 0], [0, 0, 0, 2]]
+    csp1, array1 = tmpl.clone(grid)
+    csp2, array2 = tmpl.clone()
+    assert BT(csp1).count_solutions(prop_GAC) == BT(models.sudoku_nary_ad(grid)[0]).count_solutions(prop_GAC)
+    assert BT(csp2).count_solutions(prop_GAC) == 288
+    assert [[v.get_assigned_value() or 0 for v in row] for row in array1] == grid
+    assert not any(v.is_assigned() for v in tmpl.csp.vars)
+
+def test_save_load():
+    fd, path = tempfile.mkstemp(suffix=".pickle")
+    os.close(fd)
+    try:
+        ModelTemplate(9).save(path)
+        tmpl = ModelTemplate.load(path)
+    finally:
+        os.remove(path)
+    name, level, grid = corpus(["hard"])[0]
+    csp, var_array = tmpl.instance(grid)
+    same_search(csp, var_array, grid, models.sudoku_nary_ad, configs[0])
+
+if __name__ == "__main__":
+    for test in [test_instance_and_clone, test_clones_are_independent, test_save_load]:
+        test()
+        print(test.__name__, "passed")
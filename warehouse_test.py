@@ -0,0 +1,90 @@
+from cspbase import *
+from propagators import *
+from models import *
+import itertools
+import random
+
+'''
+Checks of the warehouse models and of CageConstraint: the cage filter
+must keep exactly the values a brute force search finds a support for,
+and the solutions of a board must satisfy its rooms.
+Run with python warehouse_test.py (or pytest).
+'''
+
+board = [[4], [11, 0, 1], [12, 21, 22, 31, 2, 2], [41, 42, 3, 3], [32, 23, 33, 43, 1, 11],
+         [13, 14, 24, 34, 1, 10], [44, 0, 2]]
+
+#the 8x8 board of the drivers
+large_board = [[8], [11, 12, 22, 32, 2, 2], [21, 31, 41, 51, 1, 17], [61, 71, 81, 3, 7],
+               [42, 43, 52, 62, 1, 17], [72, 82, 73, 83, 53, 63, 3, 6], [44, 0, 4],
+               [13, 14, 23, 24, 25, 1, 24], [33, 34, 35, 36, 26, 1, 18], [54, 64, 74, 84, 2, 1],
+               [15, 16, 17, 2, 1], [18, 28, 3, 6], [27, 37, 38, 48, 3, 6],
+               [45, 46, 47, 55, 56, 65, 75, 1, 35], [57, 66, 67, 1, 12], [76, 77, 78, 68, 58, 2, 5],
+               [85, 0, 4], [86, 87, 88, 3, 8]]
+
+def brute_support(c, var, val):
+    '''True iff var=val extends to a tuple of the current domains that
+       satisfies c'''
+    doms = [(val,) if v is var else v.cur_domain() for v in c.scope]
+    return any(c.check(t) for t in itertools.product(*doms))
+
+def test_cage_filter():
+    rng = random.Random(5)
+    for op in CageConstraint.OPS:
+        for trial in range(40):
+            n = rng.randrange(2, 4)
+            vars = [Variable("V{}".format(i), list(range(1, 6))) for i in range(n)]
+            for var in vars:
+                for val in rng.sample(range(1, 6), rng.randrange(0, 3)):
+                    var.prune_value(val)
+            t = tuple(rng.choice(var.cur_domain()) for var in vars)
+            c = CageConstraint("Cage", vars, op, 0)
+            #a target some tuple of the domains reaches
+            c.target = {"sum": sum(t), "product": CageConstraint.prod(t),
+                        "min": min(t), "max": max(t)}.get(op)
+            if c.target is None:
+                rest = sorted(t)[:-1]
+                c.target = (max(t) - sum(rest) if op == "difference"
+                            else max(t) // CageConstraint.prod(rest))
+            if c.target < 1 or not c.check(t):
+                #the operations only have positive integer targets
+                continue
+            for var in vars:
+                for val in var.domain():
+                    if var.in_cur_domain(val):
+                        assert c.has_support(var, val) == brute_support(c, var, val), (op, c.target)
+
+def test_full_model():
+    for grid in [warehouse_binary_ne_grid, warehouse_nary_ad_grid]:
+        csp, var_array = warehouse_full_model(board, grid=grid)
+        result = BT(csp).bt_search(prop_GAC)
+        assert result.solved()
+        solution = result.grid(var_array)
+        for row in solution:
+            assert sorted(row) == [1, 2, 3, 4]
+        for c in csp.get_all_cons():
+            assert c.check([result.value(var) for var in c.scope])
+
+def test_solve_warehouse():
+    result, var_array = solve_warehouse(large_board)
+    assert result.solved()
+    solution = result.grid(var_array)
+    for i in range(8):
+        assert sorted(solution[i]) == list(range(1, 9))
+        assert sorted(row[i] for row in solution) == list(range(1, 9))
+    csp, var_array = warehouse_full_model(large_board)
+    for c in csp.get_all_cons():
+        assert c.check([solution[int(var.name[0]) - 1][int(var.name[1]) - 1] for var in c.scope])
+
+def test_bad_board():
+    for bad in [[[4], [11, 5, 1]], [[4], [11, 51, 1, 3]], [[10]]]:
+        try:
+            warehouse_full_model(bad)
+        except ValueError:
+            continue
+        assert False, bad
+
+if __name__ == "__main__":
+    for test in [test_cage_filter, test_full_model, test_solve_warehouse, test_bad_board]:
+        test()
+        print(test.__name__, "passed")